@@ -0,0 +1,73 @@
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import os
+import time
+
+from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from store.db import init_db
+
+WORKER_THREADS = int(os.getenv("WORKER_THREADS", "4"))  # bound for ASR / diarize / LLM threads
+WARMUP_ASR = os.getenv("WARMUP_ASR", "1") == "1"  # load + run Whisper once before serving
+WARMUP_DIARIZE = os.getenv("WARMUP_DIARIZE", "0") == "1"  # needs HUGGINGFACE_TOKEN, so opt-in
+# load pyannote at import, before a preforking server starts its workers
+DIARIZE_PRELOAD = os.getenv("DIARIZE_PRELOAD", "0") == "1"
+
+def _warmup():
+    """Load models and run them once so the first request does not pay for it."""
+    if WARMUP_ASR:
+        t0 = time.perf_counter()
+        try:
+            import numpy as np
+            from core.asr import SAMPLE_RATE, get_asr
+            # 1 s of silence: pages in the weights and initializes CTranslate2's kernels
+            segs, _ = get_asr().model.transcribe(np.zeros(SAMPLE_RATE, dtype=np.float32), language="en", beam_size=1)
+            list(segs)
+            print(f"[warmup] asr ready in {time.perf_counter() - t0:.1f}s")
+        except Exception as e:
+            print(f"[warmup] asr failed: {e}")
+    if WARMUP_DIARIZE:
+        t0 = time.perf_counter()
+        try:
+            from core.diarize import get_diar_pipeline
+            get_diar_pipeline()
+            print(f"[warmup] diarization ready in {time.perf_counter() - t0:.1f}s")
+        except Exception as e:
+            print(f"[warmup] diarization failed: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # DDL runs once per worker at startup, not on import
+    init_db()
+    # asyncio.to_thread uses the loop's default executor; bound it so long ASR jobs
+    # cannot spawn an unbounded number of threads
+    executor = ThreadPoolExecutor(max_workers=WORKER_THREADS, thread_name_prefix="collabplan")
+    asyncio.get_running_loop().set_default_executor(executor)
+    await asyncio.to_thread(_warmup)
+    yield
+    executor.shutdown(wait=False)
+
+def create_app() -> FastAPI:
+    app = FastAPI(
+        title="CollabPlan-AI Core",
+        version="0.1.0",
+        description="Backend core for meeting transcription and action planning",
+        lifespan=lifespan,
+        default_response_class=ORJSONResponse,
+    )
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["http://localhost:5173"],
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    # transcripts and task lists compress well; tiny JSON (health, ids) is left alone
+    app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+    if DIARIZE_PRELOAD:
+        # runs in the master under gunicorn --preload; lifespan only runs in the workers
+        from core.diarize import preload_diar_pipeline
+        preload_diar_pipeline()
+    return app
@@ -1,34 +1,37 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form
-from pydantic import BaseModel, Field
+from fastapi import BackgroundTasks, HTTPException, Request, UploadFile, File, Form
 from typing import List, Optional
 from datetime import date
-from sqlalchemy import func, desc
+from sqlalchemy import func, desc, bindparam
+from sqlalchemy.orm import joinedload, selectinload
 from sqlmodel import Session, select, delete
-from store.db import init_db, Run, Segment, Plan, TaskRow, engine
-from core.asr import get_asr, ASRSegment
-from core.extract import extract_plan, LLMError
+from store.db import Run, Segment, Plan, TaskRow, engine, bulk_insert_segments
+from store import asr_cache, plan_cache
+from core.asr import get_asr, load_audio, ASRSegment
+from core.vad import decode_to_mono16_wav, is_mono16_wav
+from core.extract import extract_plan, LLMError, DEFAULT_MODEL
 from core.diarize import diarize_file, assign_speakers_to_segments, build_speaker_name_map, apply_name_map
+from api.app import create_app
+from api.schemas import (
+    Evidence, Task, AnalyzeRequest, AnalyzeResponse,
+    TranscribeRequest, TranscribeResponse,
+    AnalyzePlanResponse, RunBundle,
+    ANALYZE_ADAPTER, ANALYZE_PLAN_ADAPTER,
+)
+from fastapi.responses import ORJSONResponse
 from starlette.responses import Response, StreamingResponse
-import io, csv, json
-import hashlib, mimetypes, pathlib, shutil, uuid, tempfile ,subprocess, os 
-from fastapi.middleware.cors import CORSMiddleware
+import asyncio
+import csv, logging, re
+import orjson
+import hashlib, mimetypes, pathlib, secrets, shutil, tempfile, subprocess, os, time
 
 USE_VAD = os.getenv("USE_VAD", "1") == "1"  # set to 0 to disable quickly
 VAD_AGGR = int(os.getenv("VAD_AGGR", "2"))
+ASR_BEAM_SIZE = int(os.getenv("ASR_BEAM_SIZE", "1"))  # greedy for interactive requests; 5 for best accuracy
 
-app = FastAPI(
-    title="CollabPlan-AI Core",
-    version="0.1.0",
-    description="Backend core for meeting transcription and action planning",
-)
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost:5173"],
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+app = create_app()
+logger = logging.getLogger(__name__)
 
-init_db()
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+")
 
 UPLOAD_DIR = pathlib.Path("data/uploads")
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
@@ -39,77 +42,150 @@ _AUDIO_CT = {
     "audio/x-flac", "audio/flac"
 }
 
+def _json_response(adapter, obj) -> Response:
+    # dump_json emits bytes straight from pydantic-core, no intermediate dict
+    return Response(content=adapter.dump_json(obj), media_type="application/json")
+
+COPY_CHUNK = 4 * 1024 * 1024  # upload copy buffer
+
+class _HashingWriter:
+    """File-like sink for shutil.copyfileobj: hashes and writes each chunk in one pass."""
+    def __init__(self, f, h):
+        self.f = f
+        self.h = h
+
+    def write(self, b):
+        self.h.update(b)  # OpenSSL, releases the GIL on large buffers
+        return self.f.write(b)
+
+def _asr_config(asr) -> str:
+    # request-level settings that change ASR output, on top of the engine's own
+    return f"{asr.config_tag}|vad{int(USE_VAD)}:{VAD_AGGR}|beam{ASR_BEAM_SIZE}"
+
 def _safe_ext(filename: str, content_type: str) -> str:
     ext = pathlib.Path(filename).suffix.lower()
     if not ext:
         ext = mimetypes.guess_extension(content_type or "") or ".bin"
     return ext
 
-# ---------- analyze ----------
-
-class Evidence(BaseModel):
-    segment_idx: Optional[int] = Field(None, description="Index of transcript segment")
-    span: Optional[List[int]] = Field(None, description="[start_char, end_char] in that segment")
-
-class Task(BaseModel):
-    title: str
-    owner: Optional[str] = None
-    due_date: Optional[date] = None
-    priority: Optional[str] = Field(None, description="High, Medium, Low")
-    dependencies: List[str] = []
-    evidence: Optional[Evidence] = None
-    confidence: Optional[float] = Field(None, ge=0.0, le=1.0)
-
-class AnalyzeRequest(BaseModel):
-    meeting_date: date
-    transcript: str
-
-class AnalyzeResponse(BaseModel):
-    run_id: str
-    meeting_date: date
-    summary: str
-    tasks: List[Task]
-    open_questions: List[str]
-
-# ---------- transcribe ----------
-
-class SegmentOut(BaseModel):
-    idx: int
-    start: float
-    end: float
-    text: str
-    speaker: Optional[str] = None
-
-class TranscribeRequest(BaseModel):
-    meeting_date: date
-    source: str  # "upload", "recording"
-    path: str    # local path to audio file
-    diarize: Optional[bool] = False
-
-class TranscribeResponse(BaseModel):
-    run_id: str
-    duration_sec: float
-    segments: List[SegmentOut]
-
-# ---------- analyze/runID ----------
-
-class AnalyzePlanResponse(BaseModel):
-    run_id: str
-    meeting_date: date
-    summary: str
-    tasks: List[Task]
-    open_questions: List[str]
-
-# ---------- run ----------
-
-class RunBundle(BaseModel):
-    run_id: str
-    meeting_date: date
-    duration_sec: Optional[float] = None
-    segments: List[SegmentOut]
-    summary: str
-    tasks: List[Task]
-    open_questions: List[str]
+# ---------- db helpers ----------
+
+def _persist_transcript(run_id: str, meeting_date: date, source: str, duration: Optional[float], segs_out: List[dict]):
+    # Run row and all segments in one transaction: one commit (one WAL sync) per transcript
+    with engine.begin() as conn:
+        conn.execute(Run.__table__.insert(), dict(id=run_id, meeting_date=meeting_date, source=source, duration_sec=duration))
+        bulk_insert_segments(run_id, segs_out, conn=conn)
+
+PERSIST_RETRIES = 3
+
+def _persist_segments(run_id: str, segs_out: List[dict]):
+    # segments and the status flip commit together, so "ok" always means fully written
+    run = Run.__table__
+    with engine.begin() as conn:
+        bulk_insert_segments(run_id, segs_out, conn=conn)
+        conn.execute(run.update().where(run.c.id == run_id).values(status="ok", version=run.c.version + 1))
+
+def _persist_segments_bg(run_id: str, segs_out: List[dict]):
+    """
+    Writes a transcript's segments after the response is sent. The Run row is
+    already there with status "pending"; retries with backoff (e.g. "database is
+    locked") and marks the run "failed" if it gives up, so /run/{run_id} says so.
+    """
+    for attempt in range(1, PERSIST_RETRIES + 1):
+        try:
+            _persist_segments(run_id, segs_out)
+            return
+        except Exception:
+            if attempt < PERSIST_RETRIES:
+                logger.warning("persist %s attempt %d/%d failed", run_id, attempt, PERSIST_RETRIES, exc_info=True)
+                time.sleep(0.5 * 2 ** (attempt - 1))
+            else:
+                logger.exception("persist %s failed after %d attempts (%d segments)", run_id, PERSIST_RETRIES, len(segs_out))
+    try:
+        _set_run_status(run_id, "failed")
+    except Exception:
+        logger.exception("could not mark %s as failed", run_id)
+
+def _insert_run(run_id: str, meeting_date: date, source: str, duration: Optional[float], status: str = "ok"):
+    with Session(engine, expire_on_commit=False) as session:
+        session.add(Run(id=run_id, meeting_date=meeting_date, source=source, duration_sec=duration, status=status))
+        session.commit()
+
+def _set_run_status(run_id: str, status: str):
+    run = Run.__table__
+    with engine.begin() as conn:
+        conn.execute(run.update().where(run.c.id == run_id).values(status=status, version=run.c.version + 1))
+
+def _bump_version(session: Session, run_id: str):
+    # any change to what /run/{run_id} returns, other than new segments, goes through here
+    run = Run.__table__
+    session.execute(run.update().where(run.c.id == run_id).values(version=run.c.version + 1))
+
+def _update_speakers(run_id: str, speakers: List[dict]):
+    """speakers: [{"b_idx": idx, "b_speaker": label}, ...]"""
+    if not speakers:
+        return
+    seg = Segment.__table__
+    stmt = (
+        seg.update()
+        .where(seg.c.run_id == run_id, seg.c.idx == bindparam("b_idx"))
+        .values(speaker=bindparam("b_speaker"))
+    )
+    with Session(engine, expire_on_commit=False) as session:
+        session.connection().execute(stmt, speakers)
+        _bump_version(session, run_id)
+        session.commit()
+
+def _load_run_segments(run_id: str):
+    with Session(engine, expire_on_commit=False) as session:
+        run = session.exec(select(Run).where(Run.id == run_id)).first()
+        if not run:
+            raise HTTPException(status_code=404, detail=f"Run not found: {run_id}")
+        segs = session.exec(select(Segment).where(Segment.run_id == run_id).order_by(Segment.idx)).all()
+        seg_dicts = [{"idx": s.idx, "start": s.start, "end": s.end, "text": s.text, "speaker": s.speaker} for s in segs]
+    return run, seg_dicts
+
+def _due_date(due_iso) -> Optional[date]:
+    # "YYYY-MM-DD" -> date, anything else -> None
+    if isinstance(due_iso, str) and due_iso:
+        try:
+            return date.fromisoformat(due_iso)
+        except ValueError:
+            return None
+    return None
+
+def _write_plan(session: Session, run_id: str, plan: dict):
+    session.add(Plan(
+        run_id=run_id,
+        summary=plan["summary"],
+        open_questions=plan["open_questions"],
+    ))
+    # Core INSERT: task rows prebuilt as dicts, one executemany, no ORM objects
+    task_rows = [
+        dict(
+            run_id=run_id,
+            title=t["title"],
+            owner=t.get("owner"),
+            due_date=_due_date(t.get("due_date")),
+            priority=t.get("priority"),
+            dependencies_json=t.get("dependencies", []),  # column key; the JSON type encodes it
+            evidence_idx=None,
+            evidence_span_json=None,
+            confidence=t.get("confidence"),
+        )
+        for t in plan["tasks"]
+    ]
+    if task_rows:
+        session.execute(TaskRow.__table__.insert(), task_rows)
+
+def _replace_plan(run_id: str, plan: dict):
+    with Session(engine, expire_on_commit=False) as session:
+        # Remove old plan/tasks for idempotency if you re-run analyze
+        session.exec(delete(TaskRow).where(TaskRow.run_id == run_id))
+        session.exec(delete(Plan).where(Plan.run_id == run_id))
+        _write_plan(session, run_id, plan)
+        _bump_version(session, run_id)
+        session.commit()
 
 ##############################
 # ---------- Routes ----------
@@ -120,61 +196,156 @@ def health():
     return {"status": "ok", "version": app.version}
 
 @app.post("/transcribe", response_model=TranscribeResponse)
-def transcribe_audio(req: TranscribeRequest):
+async def transcribe_audio(req: TranscribeRequest, background: BackgroundTasks):
     """
     Real transcription using faster-whisper.
     - Reads the file at req.path
-    - Saves segments to DB
     - Returns run_id, duration, segments
+    - Saves segments to DB after the response is sent (poll /run/{run_id} until
+      status is "ok"; "failed" means they could not be stored)
+    Blocking work (ffmpeg, ASR, diarization, DB) runs in worker threads.
     """
-    norm_path = _normalize_to_wav16k(req.path)
-    # Run ASR
-    asr = get_asr()
-    duration, segs_asr = asr.transcribe_file(
-        norm_path,
-        use_ext_vad=USE_VAD,
-        vad_aggr=VAD_AGGR,
-        beam_size=5,
-        language=None,
-    )
+    norm_path = await asyncio.to_thread(_normalize_to_wav16k, req.path)
+    asr = await asyncio.to_thread(get_asr)
+    asr_cfg = _asr_config(asr)
+    cache_key = await asyncio.to_thread(asr_cache.cache_key, norm_path, asr_cfg)
+    cached = await asyncio.to_thread(asr_cache.get, cache_key)
+
+    turns = None
+    if cached is not None:
+        # same audio + settings seen before: only diarization (if asked) still runs
+        duration, segs_out = cached
+        if req.diarize:
+            try:
+                turns = await asyncio.to_thread(diarize_file, norm_path)
+            except Exception as e:
+                print(f"[diarize] failed: {e}")
+    else:
+        # Decode once; ASR and diarization both read the same 16 kHz waveform
+        audio = await asyncio.to_thread(load_audio, norm_path)
+        asr_job = asyncio.to_thread(
+            asr.transcribe_array,
+            audio,
+            use_ext_vad=USE_VAD,
+            vad_aggr=VAD_AGGR,
+            beam_size=ASR_BEAM_SIZE,
+            language=None,
+        )
 
-    # Map ASR segments to API model
-    segs_out = [
-        SegmentOut(idx=s.idx, start=s.start, end=s.end, text=s.text, speaker=s.speaker)
-        for s in segs_asr
-    ]
-    
-    if req.diarize:
+        if req.diarize:
+            # run both models side by side; a diarization failure only drops speakers
+            asr_res, turns = await asyncio.gather(asr_job, asyncio.to_thread(diarize_file, audio), return_exceptions=True)
+            if isinstance(asr_res, BaseException):
+                raise asr_res
+            if isinstance(turns, BaseException):
+                print(f"[diarize] failed: {turns}")
+                turns = None
+        else:
+            asr_res = await asr_job
+        duration, segs_asr = asr_res
+
+        # Plain dicts in SegmentOut shape; ASRSegment fields are already typed, so skip
+        # pydantic here and let orjson serialize them once
+        segs_out = [dict(idx=s.idx, start=s.start, end=s.end, text=s.text, speaker=s.speaker) for s in segs_asr]
+        background.add_task(asr_cache.put, cache_key, asr_cfg, duration, segs_out)
+
+    if turns is not None:
         try:
-            turns = diarize_file(norm_path)
-            segs_dicts = [dict(idx=s.idx, start=s.start, end=s.end, text=s.text, speaker=s.speaker) for s in segs_out]
-            segs_with_spk = assign_speakers_to_segments(segs_dicts, turns)
+            segs_with_spk = assign_speakers_to_segments(segs_out, turns)
 
             # NEW: map S0/S1... to names using intros
             name_map = build_speaker_name_map(segs_with_spk)
             if name_map:
                 segs_with_spk = apply_name_map(segs_with_spk, name_map)
 
-            segs_out = [SegmentOut(**s) for s in segs_with_spk]
+            segs_out = segs_with_spk
         except Exception as e:
             print(f"[diarize] failed: {e}")
 
-    # Persist
-    run_id = f"run_{uuid.uuid4().hex[:12]}"
-    with Session(engine) as session:
-        session.add(Run(id=run_id, meeting_date=req.meeting_date, source=req.source, duration_sec=duration))
-        for s in segs_out:
-            session.add(Segment(
-                run_id=run_id,
-                idx=s.idx,
-                start=s.start,
-                end=s.end,
-                text=s.text,
-                speaker=s.speaker
-            ))
-        session.commit()
+    # The Run row is written now so /run/{run_id} exists (status "pending") as soon as
+    # the client has the id; segments follow once the response is flushed
+    run_id = f"run_{secrets.token_hex(6)}"
+    await asyncio.to_thread(_insert_run, run_id, req.meeting_date, req.source, duration, "pending")
+    background.add_task(_persist_segments_bg, run_id, segs_out)
+
+    # response_model stays for the OpenAPI schema; returning a Response skips re-validation
+    return ORJSONResponse({"run_id": run_id, "duration_sec": duration, "segments": segs_out})
+
+STREAM_BATCH = 100  # segments per DB insert while streaming
+
+@app.post("/transcribe_stream")
+async def transcribe_stream(req: TranscribeRequest):
+    """
+    Same as /transcribe, but streams NDJSON while faster-whisper decodes.
+    Lines, in order:
+      {"event": "run", "run_id": ..., "duration_sec": ...}
+      {"event": "segment", "idx": ..., "start": ..., "end": ..., "text": ..., "speaker": null}  (one per segment)
+      {"event": "speakers", "speakers": {"<idx>": "<label>", ...}}  (only when diarize=true)
+    Segments are written to the DB in batches as they arrive.
+    """
+    norm_path = await asyncio.to_thread(_normalize_to_wav16k, req.path)
+    asr = await asyncio.to_thread(get_asr)
+    duration, segs_iter = await asyncio.to_thread(
+        asr.stream_file,
+        norm_path,
+        use_ext_vad=USE_VAD,
+        vad_aggr=VAD_AGGR,
+        beam_size=ASR_BEAM_SIZE,
+        language=None,
+    )
+
+    run_id = f"run_{secrets.token_hex(6)}"
+    # "pending" until the last batch is in, so an "ok" run is never half a transcript
+    await asyncio.to_thread(_insert_run, run_id, req.meeting_date, req.source, duration, "pending")
+
+    async def gen():
+        yield orjson.dumps({"event": "run", "run_id": run_id, "duration_sec": duration}) + b"\n"
+
+        segs_dicts: List[dict] = []
+        batch: List[dict] = []
+        try:
+            while True:
+                s = await asyncio.to_thread(next, segs_iter, None)
+                if s is None:
+                    break
+                row = dict(idx=s.idx, start=s.start, end=s.end, text=s.text, speaker=s.speaker)
+                segs_dicts.append(row)
+                batch.append(row)
+                if len(batch) >= STREAM_BATCH:
+                    await asyncio.to_thread(bulk_insert_segments, run_id, batch)
+                    batch = []
+                yield orjson.dumps({"event": "segment", **row}) + b"\n"
+            if batch:
+                await asyncio.to_thread(bulk_insert_segments, run_id, batch)
+            await asyncio.to_thread(_set_run_status, run_id, "ok")
+        except BaseException:
+            # ASR / DB error or the client went away mid-stream: the stored transcript is partial.
+            # Plain call, not to_thread: this may run while the generator is being closed.
+            try:
+                _set_run_status(run_id, "failed")
+            except Exception:
+                logger.exception("could not mark %s as failed", run_id)
+            raise
+
+        if req.diarize and segs_dicts:
+            try:
+                turns = await asyncio.to_thread(diarize_file, norm_path)
+                segs_with_spk = assign_speakers_to_segments(segs_dicts, turns)
+                name_map = build_speaker_name_map(segs_with_spk)
+                if name_map:
+                    segs_with_spk = apply_name_map(segs_with_spk, name_map)
 
-    return TranscribeResponse(run_id=run_id, duration_sec=duration, segments=segs_out)
+                labeled = [s for s in segs_with_spk if s.get("speaker")]
+                await asyncio.to_thread(
+                    _update_speakers, run_id,
+                    [{"b_idx": s["idx"], "b_speaker": s["speaker"]} for s in labeled],
+                )
+                yield orjson.dumps({"event": "speakers", "speakers": {str(s["idx"]): s["speaker"] for s in labeled}}) + b"\n"
+            except Exception as e:
+                print(f"[diarize_stream] failed: {e}")
+
+    # identity: keep GZipMiddleware from buffering the stream inside the compressor
+    return StreamingResponse(gen(), media_type="application/x-ndjson", headers={"Content-Encoding": "identity"})
 
 @app.post("/transcribe_upload", response_model=TranscribeResponse)
 async def transcribe_upload(
@@ -184,61 +355,58 @@ async def transcribe_upload(
 ):
     """
     Accept an uploaded audio file, run ASR (and optional diarization), save to DB, return run info.
+    Blocking work (copy, ffmpeg, ASR, diarization, DB) runs in worker threads.
     """
     # persist upload to a temp file
     suffix = "." + (file.filename.split(".")[-1].lower() if file.filename and "." in file.filename else "bin")
     with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
         tmp_path = tmp.name
-        shutil.copyfileobj(file.file, tmp)
-    
-    norm_path = _normalize_to_wav16k(tmp_path)
-    try:
-        # ASR
-        asr = get_asr()
-        duration, segs_asr = asr.transcribe_file(
-            norm_path,
-            use_ext_vad=USE_VAD,
-            vad_aggr=VAD_AGGR,
-            beam_size=5,
-            language=None,
-        )
+        await asyncio.to_thread(shutil.copyfileobj, file.file, tmp, COPY_CHUNK)
 
-        segs_out = [
-            SegmentOut(idx=s.idx, start=s.start, end=s.end, text=s.text, speaker=s.speaker)
-            for s in segs_asr
-        ]
+    try:
+        norm_path = await asyncio.to_thread(_normalize_to_wav16k, tmp_path)
+
+        # ASR, unless this exact audio was transcribed with the same settings before
+        asr = await asyncio.to_thread(get_asr)
+        asr_cfg = _asr_config(asr)
+        cache_key = await asyncio.to_thread(asr_cache.cache_key, norm_path, asr_cfg)
+        cached = await asyncio.to_thread(asr_cache.get, cache_key)
+        if cached is not None:
+            duration, segs_out = cached
+        else:
+            duration, segs_asr = await asyncio.to_thread(
+                asr.transcribe_file,
+                norm_path,
+                use_ext_vad=USE_VAD,
+                vad_aggr=VAD_AGGR,
+                beam_size=ASR_BEAM_SIZE,
+                language=None,
+            )
+
+            # One list of SegmentOut-shaped dicts from ASR to diarization, DB and response
+            segs_out = [dict(idx=s.idx, start=s.start, end=s.end, text=s.text, speaker=s.speaker) for s in segs_asr]
+            await asyncio.to_thread(asr_cache.put, cache_key, asr_cfg, duration, segs_out)
 
         # diarization if requested
         if diarize:
             try:
-                turns = diarize_file(norm_path)
-                segs_dicts = [dict(idx=s.idx, start=s.start, end=s.end, text=s.text, speaker=s.speaker) for s in segs_out]
-                segs_with_spk = assign_speakers_to_segments(segs_dicts, turns)
+                turns = await asyncio.to_thread(diarize_file, norm_path)
+                segs_with_spk = assign_speakers_to_segments(segs_out, turns)
 
                 name_map = build_speaker_name_map(segs_with_spk)
                 if name_map:
                     segs_with_spk = apply_name_map(segs_with_spk, name_map)
 
-                segs_out = [SegmentOut(**s) for s in segs_with_spk]
+                segs_out = segs_with_spk
             except Exception as e:
                 print(f"[diarize_upload] failed: {e}")
 
         # persist
-        run_id = f"run_{uuid.uuid4().hex[:12]}"
-        with Session(engine) as session:
-            session.add(Run(id=run_id, meeting_date=meeting_date, source="upload", duration_sec=duration))
-            for s in segs_out:
-                session.add(Segment(
-                    run_id=run_id,
-                    idx=s.idx,
-                    start=s.start,
-                    end=s.end,
-                    text=s.text,
-                    speaker=s.speaker
-                ))
-            session.commit()
-
-        return TranscribeResponse(run_id=run_id, duration_sec=duration, segments=segs_out)
+        run_id = f"run_{secrets.token_hex(6)}"
+        await asyncio.to_thread(_persist_transcript, run_id, meeting_date, "upload", duration, segs_out)
+
+        # response_model stays for the OpenAPI schema; returning a Response skips re-validation
+        return ORJSONResponse({"run_id": run_id, "duration_sec": duration, "segments": segs_out})
 
     finally:
         try:
@@ -248,32 +416,18 @@ async def transcribe_upload(
 
 @app.post("/analyze", response_model=AnalyzeResponse)
 def analyze_text(req: AnalyzeRequest):
-    run_id = f"run_{uuid.uuid4().hex[:12]}"
+    run_id = f"run_{secrets.token_hex(6)}"
 
     text = (req.transcript or "").strip()
     if not text:
         raise HTTPException(status_code=400, detail="Empty transcript")
 
-    import re as _re
-    sentences = [s.strip() for s in _re.split(r"(?<=[.!?])\s+", text) if s.strip()]
-
-    segs = []
-    for i, s in enumerate(sentences):
-        segs.append({"idx": i, "start": 0.0, "end": 0.0, "text": s, "speaker": None})
+    # text is stripped and the split eats the whitespace, so pieces need no second strip
+    sentences = [s for s in _SENTENCE_SPLIT.split(text) if s]
+    segs = [{"idx": i, "start": 0.0, "end": 0.0, "text": s, "speaker": None} for i, s in enumerate(sentences)]
 
     # persist run + segments (duration unknown here)
-    with Session(engine) as session:
-        session.add(Run(id=run_id, meeting_date=req.meeting_date, source="text", duration_sec=None))
-        for seg in segs:
-            session.add(Segment(
-                run_id=run_id,
-                idx=seg["idx"],
-                start=seg["start"],
-                end=seg["end"],
-                text=seg["text"],
-                speaker=seg["speaker"],
-            ))
-        session.commit()
+    _persist_transcript(run_id, req.meeting_date, "text", None, segs)
 
     # plan
     try:
@@ -283,35 +437,9 @@ def analyze_text(req: AnalyzeRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Analyze failed: {e}")
 
-    with Session(engine) as session:
+    with Session(engine, expire_on_commit=False) as session:
         # idempotency not needed (new run), just write
-        session.add(Plan(
-            run_id=run_id,
-            summary=plan["summary"],
-            open_questions_json=json.dumps(plan["open_questions"])
-        ))
-
-        for t in plan["tasks"]:
-            # convert due_date "YYYY-MM-DD" -> date
-            due_obj = None
-            due_iso = t.get("due_date")
-            if isinstance(due_iso, str) and due_iso:
-                try:
-                    due_obj = date.fromisoformat(due_iso)
-                except ValueError:
-                    due_obj = None
-
-            session.add(TaskRow(
-                run_id=run_id,
-                title=t["title"],
-                owner=t.get("owner"),
-                due_date=due_obj,
-                priority=t.get("priority"),
-                dependencies_json=json.dumps(t.get("dependencies", [])),
-                evidence_idx=None,
-                evidence_span_json=None,
-                confidence=t.get("confidence"),
-            ))
+        _write_plan(session, run_id, plan)
         session.commit()
 
     # 6) response DTOs
@@ -319,7 +447,7 @@ def analyze_text(req: AnalyzeRequest):
         Task(
             title=t["title"],
             owner=t.get("owner"),
-            due_date=(date.fromisoformat(t["due_date"]) if isinstance(t.get("due_date"), str) else None),
+            due_date=_due_date(t.get("due_date")),
             priority=t.get("priority"),
             dependencies=t.get("dependencies", []),
             evidence=Evidence(segment_idx=None, span=None),
@@ -328,29 +456,30 @@ def analyze_text(req: AnalyzeRequest):
         for t in plan["tasks"]
     ]
 
-    return AnalyzeResponse(
+    return _json_response(ANALYZE_ADAPTER, AnalyzeResponse(
         run_id=run_id,
         meeting_date=req.meeting_date,
         summary=plan["summary"],
         tasks=tasks_out,
         open_questions=plan["open_questions"],
-    )
+    ))
 
 @app.post("/analyze/{run_id}", response_model=AnalyzePlanResponse)
-def analyze_run(run_id: str):
-    with Session(engine) as session:
-        run = session.exec(select(Run).where(Run.id == run_id)).first()
-        if not run:
-            raise HTTPException(status_code=404, detail=f"Run not found: {run_id}")
-        segs = session.exec(select(Segment).where(Segment.run_id == run_id).order_by(Segment.idx)).all()
-        seg_dicts = [{"idx": s.idx, "start": s.start, "end": s.end, "text": s.text, "speaker": s.speaker} for s in segs]
-
-    try:
-        plan = extract_plan(run.meeting_date, seg_dicts)
-    except LLMError as e:
-        raise HTTPException(status_code=502, detail=f"LLM failure: {e}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Analyze failed: {e}")
+async def analyze_run(run_id: str):
+    run, seg_dicts = await asyncio.to_thread(_load_run_segments, run_id)
+
+    # re-analyzing the same (or a near-identical) transcript reuses the stored plan
+    probe = await asyncio.to_thread(plan_cache.probe, run.meeting_date, seg_dicts, DEFAULT_MODEL)
+    if probe.plan is not None:
+        plan = probe.plan
+    else:
+        try:
+            plan = await asyncio.to_thread(extract_plan, run.meeting_date, seg_dicts)
+        except LLMError as e:
+            raise HTTPException(status_code=502, detail=f"LLM failure: {e}")
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Analyze failed: {e}")
+        await asyncio.to_thread(plan_cache.store, probe, plan)
 
     tasks = [
         Task(
@@ -366,187 +495,256 @@ def analyze_run(run_id: str):
     ]
 
     # Persist plan and tasks
-    with Session(engine) as session:
-        # Remove old plan/tasks for idempotency if you re-run analyze
-        session.exec(delete(TaskRow).where(TaskRow.run_id == run_id))
-        session.exec(delete(Plan).where(Plan.run_id == run_id))
-
-        session.add(Plan(
-            run_id=run_id,
-            summary=plan["summary"],
-            open_questions_json=json.dumps(plan["open_questions"])
-        ))
-
-        for t in plan["tasks"]:
-            due_iso = t.get("due_date")  # "YYYY-MM-DD" or None
-            due_obj = date.fromisoformat(due_iso) if isinstance(due_iso, str) and due_iso else None
-
-            session.add(TaskRow(
-                run_id=run_id,
-                title=t["title"],
-                owner=t.get("owner"),
-                due_date=due_obj,
-                priority=t.get("priority"),
-                dependencies_json=json.dumps(t.get("dependencies", [])),
-                evidence_idx=None,
-                evidence_span_json=None,
-                confidence=t.get("confidence"),
-            ))
-
-        session.commit()
+    await asyncio.to_thread(_replace_plan, run_id, plan)
 
-    return AnalyzePlanResponse(
+    return _json_response(ANALYZE_PLAN_ADAPTER, AnalyzePlanResponse(
         run_id=run_id,
         meeting_date=run.meeting_date,
         summary=plan["summary"],
         tasks=tasks,
         open_questions=plan["open_questions"],
-    )
+    ))
 
 @app.post("/analyze_file", response_model=AnalyzeResponse)
-def analyze_file(meeting_date: date = Form(...), file: UploadFile = File(...)):
+def analyze_file(
+    meeting_date: date = Form(...),
+    file: UploadFile = File(...),
+    encoding: Optional[str] = Form(None),  # skips detection when the client knows it
+):
     raw = file.file.read()
 
-    def _text_bytes_to_str(b: bytes) -> str:
-        for enc in ("utf-8", "utf-16", "latin-1"):
-            try:
-                return b.decode(enc)
-            except Exception:
-                continue
-        return b.decode("utf-8", errors="ignore")
-
-    text = _text_bytes_to_str(raw)
+    if encoding:
+        try:
+            text = raw.decode(encoding)
+        except (LookupError, UnicodeDecodeError) as e:
+            raise HTTPException(status_code=400, detail=f"Cannot decode file as {encoding}: {e}")
+    else:
+        text = _text_bytes_to_str(raw)
     req = AnalyzeRequest(meeting_date=meeting_date, transcript=text)
     return analyze_text(req)
 
+_BOMS = (
+    (b"\xef\xbb\xbf", "utf-8"),
+    (b"\xff\xfe", "utf-16-le"),
+    (b"\xfe\xff", "utf-16-be"),
+)
+
+def _text_bytes_to_str(b: bytes) -> str:
+    # BOM decides in O(1); otherwise UTF-8 (the common case), then one charset detection pass
+    for bom, enc in _BOMS:
+        if b.startswith(bom):
+            return b[len(bom):].decode(enc, errors="replace")
+    try:
+        return b.decode("utf-8")
+    except UnicodeDecodeError:
+        pass
+    from charset_normalizer import from_bytes  # installed with requests
+    best = from_bytes(b).best()
+    if best is not None:
+        return str(best)
+    return b.decode("latin-1")
+
+def _run_etag(session: Session, run_id: str) -> str:
+    """
+    Cheap version tag for a run bundle. Re-analyze, speaker updates and status
+    changes ("pending" -> "ok"/"failed") bump Run.version (plan row ids are reused
+    by SQLite, so they cannot serve), and streaming adds segments, so version +
+    segment count change whenever the bundle does.
+    """
+    version = session.exec(select(Run.version).where(Run.id == run_id)).first()
+    seg_n = session.execute(
+        select(func.count(Segment.id)).where(Segment.run_id == run_id)  # pylint: disable=not-callable
+    ).scalar_one()
+    # every status write (_persist_segments, _set_run_status) bumps the version too
+    tag = hashlib.blake2b(f"{run_id}:{version if version is not None else ''}:{seg_n}".encode(), digest_size=8).hexdigest()
+    return f'"{tag}"'
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    return etag in tags or "*" in tags
+
 @app.get("/run/{run_id}", response_model=RunBundle)
-def get_run(run_id: str):
-    with Session(engine) as session:
-        run = session.exec(select(Run).where(Run.id == run_id)).first()
+def get_run(run_id: str, request: Request):
+    with Session(engine, expire_on_commit=False) as session:
+        # no-cache: clients always revalidate (the UI reloads right after re-analyze),
+        # but an unchanged run costs two small queries and an empty 304
+        etag = _run_etag(session, run_id)
+        cache_headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=cache_headers)
+
+        # run + plan in one JOIN, tasks in one IN-query
+        run = session.exec(
+            select(Run)
+            .where(Run.id == run_id)
+            .options(joinedload(Run.plan), selectinload(Run.tasks))
+        ).first()
         if not run:
             raise HTTPException(status_code=404, detail=f"Run not found: {run_id}")
 
-        segs = session.exec(
-            select(Segment).where(Segment.run_id == run_id).order_by(Segment.idx)
-        ).all()
-        segs_out = [SegmentOut(idx=s.idx, start=s.start, end=s.end, text=s.text, speaker=s.speaker) for s in segs]
+        # Segments can run into the thousands: stream bare column tuples off the
+        # cursor in batches (no ORM objects, no intermediate row list) into plain dicts
+        seg_rows = session.execute(
+            select(Segment.idx, Segment.start, Segment.end, Segment.text, Segment.speaker)
+            .where(Segment.run_id == run_id)
+            .order_by(Segment.idx)
+            .execution_options(yield_per=500)
+        )
+        segs_out = [dict(idx=r[0], start=r[1], end=r[2], text=r[3], speaker=r[4]) for r in seg_rows]
 
-        plan = session.exec(select(Plan).where(Plan.run_id == run_id)).first()
-        task_rows = session.exec(select(TaskRow).where(TaskRow.run_id == run_id)).all()
+        plan = run.plan
+        task_rows = run.tasks
 
         summary = plan.summary if plan else ""
-        open_q = json.loads(plan.open_questions_json) if plan else []
+        open_q = (plan.open_questions or []) if plan else []
 
         tasks = []
         for tr in task_rows:
-            tasks.append(Task(
+            tasks.append(dict(
                 title=tr.title,
                 owner=tr.owner,
                 due_date=tr.due_date,
                 priority=tr.priority,
-                dependencies=json.loads(tr.dependencies_json or "[]"),
-                evidence=Evidence(segment_idx=tr.evidence_idx, span=json.loads(tr.evidence_span_json) if tr.evidence_span_json else None),
+                dependencies=tr.dependencies or [],
+                evidence=dict(segment_idx=tr.evidence_idx, span=tr.evidence_span),
                 confidence=tr.confidence
             ))
 
-    return RunBundle(
-        run_id=run_id,
-        meeting_date=run.meeting_date,
-        duration_sec=run.duration_sec,
-        segments=segs_out,
-        summary=summary,
-        tasks=tasks,
-        open_questions=open_q
-    )
+    # same shape as RunBundle; built from DB rows, so returned without re-validation
+    return ORJSONResponse({
+        "run_id": run_id,
+        "meeting_date": run.meeting_date,
+        "duration_sec": run.duration_sec,
+        "status": run.status,
+        "segments": segs_out,
+        "summary": summary,
+        "tasks": tasks,
+        "open_questions": open_q,
+    }, headers=cache_headers)
 
 @app.get("/runs")
 def list_runs():
-    with Session(engine) as session:
-        runs = session.exec(select(Run).order_by(desc(Run.created_at))).all()
-        items = []
-        for r in runs:
-            count_expr = func.count()  # pylint: disable=not-callable
-            task_count = session.exec(
-                select(count_expr).select_from(TaskRow).where(TaskRow.run_id == r.id)
-            ).one()
-
-            # small summary preview
-            plan = session.exec(select(Plan).where(Plan.run_id == r.id)).first()
-            preview = (plan.summary[:160] + "…") if plan and plan.summary and len(plan.summary) > 160 else (plan.summary if plan else "")
-            items.append({
-                "run_id": r.id,
-                "meeting_date": r.meeting_date,
-                "duration_sec": r.duration_sec,
-                "summary_preview": preview,
-                "task_count": int(task_count or 0),
-            })
-        return items
+    # one statement: task counts pre-aggregated per run (so the plan join cannot
+    # multiply them), and only the first 161 summary chars leave SQLite
+    task_counts = (
+        select(TaskRow.run_id, func.count().label("n"))  # pylint: disable=not-callable
+        .group_by(TaskRow.run_id)
+        .subquery()
+    )
+    stmt = (
+        select(
+            Run.id, Run.meeting_date, Run.duration_sec,
+            func.substr(Plan.summary, 1, 161),
+            func.coalesce(task_counts.c.n, 0),
+        )
+        .select_from(Run)
+        .outerjoin(Plan, Plan.run_id == Run.id)
+        .outerjoin(task_counts, task_counts.c.run_id == Run.id)
+        .order_by(desc(Run.created_at))
+    )
+    with Session(engine, expire_on_commit=False) as session:
+        rows = session.execute(stmt).all()
+
+    items = []
+    for run_id, meeting_date, duration_sec, summary, task_count in rows:
+        # small summary preview
+        preview = (summary[:160] + "…") if summary and len(summary) > 160 else (summary or "")
+        items.append({
+            "run_id": run_id,
+            "meeting_date": meeting_date,
+            "duration_sec": duration_sec,
+            "summary_preview": preview,
+            "task_count": int(task_count),
+        })
+    return items
+
+class _Echo:
+    """csv.writer target: writerow() returns the formatted line instead of buffering it."""
+    def write(self, line):
+        return line
+
+EXPORT_CHUNK_ROWS = 500  # task rows fetched and sent per chunk (CSV and markdown exports)
+
+def _csv_chunks(run_id: str):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(["title", "owner", "due_date", "priority", "dependencies", "confidence"])
+    with Session(engine, expire_on_commit=False) as session:
+        result = session.execute(
+            select(TaskRow.title, TaskRow.owner, TaskRow.due_date, TaskRow.priority, TaskRow.dependencies, TaskRow.confidence)
+            .where(TaskRow.run_id == run_id)
+            .order_by(TaskRow.id)
+            .execution_options(yield_per=EXPORT_CHUNK_ROWS)
+        )
+        for part in result.partitions():
+            yield "".join(
+                writer.writerow([
+                    title or "",
+                    owner or "",
+                    due_date.isoformat() if due_date else "",
+                    priority or "",
+                    "; ".join(deps or []),
+                    ("" if confidence is None else f"{confidence:.2f}"),
+                ])
+                for title, owner, due_date, priority, deps, confidence in part
+            )
 
 @app.get("/export/{run_id}.csv")
 def export_csv(run_id: str):
-    with Session(engine) as session:
-        tasks = session.exec(select(TaskRow).where(TaskRow.run_id == run_id).order_by(TaskRow.id)).all()
-        if tasks is None:
-            raise HTTPException(status_code=404, detail=f"No tasks for run: {run_id}")
-
-        buf = io.StringIO()
-        writer = csv.writer(buf)
-        writer.writerow(["title", "owner", "due_date", "priority", "dependencies", "confidence"])
-        for t in tasks:
-            deps = json.loads(t.dependencies_json or "[]")
-            writer.writerow([
-                t.title or "",
-                t.owner or "",
-                t.due_date.isoformat() if t.due_date else "",
-                t.priority or "",
-                "; ".join(deps),
-                ("" if t.confidence is None else f"{t.confidence:.2f}"),
-            ])
-        buf.seek(0)
-        headers = {
-            "Content-Disposition": f'attachment; filename="{run_id}.csv"'
-        }
-        return StreamingResponse(iter([buf.getvalue()]), media_type="text/csv", headers=headers)
+    # rows are formatted and sent as they come off the cursor; memory stays at one chunk
+    headers = {
+        "Content-Disposition": f'attachment; filename="{run_id}.csv"'
+    }
+    return StreamingResponse(_csv_chunks(run_id), media_type="text/csv", headers=headers)
+
+def _md_chunks(run_id: str, meeting_date: date, summary: str, open_qs: List[str]):
+    yield "\n".join([
+        f"# Meeting Plan – {run_id}",
+        f"*Date:* {meeting_date.isoformat()}",
+        "",
+        "## Summary",
+        summary or "_(none)_",
+        "",
+        "## Tasks",
+    ]) + "\n"
+
+    any_tasks = False
+    with Session(engine, expire_on_commit=False) as session:
+        result = session.execute(
+            select(TaskRow.title, TaskRow.owner, TaskRow.due_date, TaskRow.priority, TaskRow.dependencies, TaskRow.confidence)
+            .where(TaskRow.run_id == run_id)
+            .order_by(TaskRow.id)
+            .execution_options(yield_per=EXPORT_CHUNK_ROWS)
+        )
+        for part in result.partitions():
+            any_tasks = True
+            yield "".join(
+                f"- **{title}** — owner: {owner or '—'}; "
+                f"due: {due_date.isoformat() if due_date else '—'}; "
+                f"priority: {priority or '—'}; "
+                f"deps: {', '.join(deps or []) or '—'}; "
+                f"conf: {f'{confidence:.2f}' if confidence is not None else '—'}\n"
+                for title, owner, due_date, priority, deps, confidence in part
+            )
+    if not any_tasks:
+        yield "_(no tasks)_\n"
+
+    yield "\n".join(["", "## Open Questions"] + ([f"- {q}" for q in open_qs] or ["_(none)_"]))
 
 @app.get("/export/{run_id}.md")
 def export_markdown(run_id: str):
-    with Session(engine) as session:
+    with Session(engine, expire_on_commit=False) as session:
         run = session.exec(select(Run).where(Run.id == run_id)).first()
         if not run:
             raise HTTPException(status_code=404, detail=f"Run not found: {run_id}")
 
         plan = session.exec(select(Plan).where(Plan.run_id == run_id)).first()
-        tasks = session.exec(select(TaskRow).where(TaskRow.run_id == run_id).order_by(TaskRow.id)).all()
-
         summary = plan.summary if plan else ""
-        open_qs = json.loads(plan.open_questions_json or "[]") if plan else []
-
-        lines = []
-        lines.append(f"# Meeting Plan – {run_id}")
-        lines.append(f"*Date:* {run.meeting_date.isoformat()}")
-        lines.append("")
-        lines.append("## Summary")
-        lines.append(summary or "_(none)_")
-        lines.append("")
-        lines.append("## Tasks")
-        if tasks:
-            for t in tasks:
-                deps = json.loads(t.dependencies_json or "[]")
-                due = t.due_date.isoformat() if t.due_date else "—"
-                conf = f"{t.confidence:.2f}" if t.confidence is not None else "—"
-                lines.append(f"- **{t.title}** — owner: {t.owner or '—'}; due: {due}; priority: {t.priority or '—'}; deps: {', '.join(deps) or '—'}; conf: {conf}")
-        else:
-            lines.append("_(no tasks)_")
-        lines.append("")
-        lines.append("## Open Questions")
-        if open_qs:
-            for q in open_qs:
-                lines.append(f"- {q}")
-        else:
-            lines.append("_(none)_")
+        open_qs = (plan.open_questions or []) if plan else []
 
-        md = "\n".join(lines)
-        return Response(content=md, media_type="text/markdown")
+    # header is built here so a missing run still 404s; tasks stream off the cursor
+    return StreamingResponse(_md_chunks(run_id, run.meeting_date, summary, open_qs), media_type="text/markdown")
     
 @app.post("/upload/audio")
 def upload_audio(file: UploadFile = File(...)):
@@ -556,31 +754,29 @@ def upload_audio(file: UploadFile = File(...)):
         print(f"[upload_audio] unexpected content-type: {ct}")
 
     ext = _safe_ext(file.filename or "audio", ct)
-    safe_name = f"{uuid.uuid4().hex}{ext}"
+    safe_name = f"{secrets.token_hex(16)}{ext}"
     out_path = UPLOAD_DIR / safe_name
 
     sha = hashlib.sha256()
     with out_path.open("wb") as f:
-        while True:
-            chunk = file.file.read(1024 * 1024)
-            if not chunk:
-                break
-            sha.update(chunk)
-            f.write(chunk)
+        shutil.copyfileobj(file.file, _HashingWriter(f, sha), length=COPY_CHUNK)
     
     wav_name = f"{out_path.stem}.wav"
     wav_path = UPLOAD_DIR / wav_name
     try:
         tmp_wav = _normalize_to_wav16k(str(out_path))
-        # if tmp_wav != wav_path, move/replace
-        if tmp_wav != str(wav_path):
+        if tmp_wav == str(out_path):
+            wav_path = out_path  # already 16k mono WAV, or ffmpeg failed: use the upload as-is
+        elif tmp_wav != str(wav_path):
             shutil.move(tmp_wav, wav_path)
     except Exception as e:
         print(f"[upload_audio] normalize failed: {e}")
         wav_path = out_path
 
+    # path is the normalized WAV, so /transcribe can skip its own ffmpeg pass
     return {
-        "path": str(out_path),
+        "path": str(wav_path),
+        "raw_path": str(out_path),
         "sha256": sha.hexdigest(),
         "filename": file.filename,
         "content_type": ct,
@@ -590,9 +786,18 @@ def upload_audio(file: UploadFile = File(...)):
 def _normalize_to_wav16k(src_path: str) -> str:
     """
     Convert any input audio to 16kHz mono WAV for consistent ASR + diarization.
-    Returns a temp file path you should delete when done.
+    Returns a temp file path you should delete when done, or src_path itself
+    when it is already 16kHz mono PCM WAV (or conversion failed).
     """
+    if is_mono16_wav(src_path):
+        return src_path
     dst = tempfile.NamedTemporaryFile(delete=False, suffix=".wav").name
+    try:
+        # in-process decode + resample, no ffmpeg fork per upload
+        decode_to_mono16_wav(src_path, dst)
+        return dst
+    except Exception as e:
+        print(f"[normalize] pyav decode failed: {e} (trying ffmpeg)")
     try:
         subprocess.run(
             [
@@ -0,0 +1,77 @@
+from pydantic import BaseModel, Field, TypeAdapter
+from typing import List, Optional
+from datetime import date
+
+# ---------- analyze ----------
+
+class Evidence(BaseModel):
+    segment_idx: Optional[int] = Field(None, description="Index of transcript segment")
+    span: Optional[List[int]] = Field(None, description="[start_char, end_char] in that segment")
+
+class Task(BaseModel):
+    title: str
+    owner: Optional[str] = None
+    due_date: Optional[date] = None
+    priority: Optional[str] = Field(None, description="High, Medium, Low")
+    dependencies: List[str] = []
+    evidence: Optional[Evidence] = None
+    confidence: Optional[float] = Field(None, ge=0.0, le=1.0)
+
+class AnalyzeRequest(BaseModel):
+    meeting_date: date
+    transcript: str
+
+class AnalyzeResponse(BaseModel):
+    run_id: str
+    meeting_date: date
+    summary: str
+    tasks: List[Task]
+    open_questions: List[str]
+
+# ---------- transcribe ----------
+
+class SegmentOut(BaseModel):
+    idx: int
+    start: float
+    end: float
+    text: str
+    speaker: Optional[str] = None
+
+class TranscribeRequest(BaseModel):
+    meeting_date: date
+    source: str  # "upload", "recording"
+    path: str    # local path to audio file
+    diarize: Optional[bool] = False
+
+class TranscribeResponse(BaseModel):
+    run_id: str
+    duration_sec: float
+    segments: List[SegmentOut]
+
+# ---------- analyze/runID ----------
+
+class AnalyzePlanResponse(BaseModel):
+    run_id: str
+    meeting_date: date
+    summary: str
+    tasks: List[Task]
+    open_questions: List[str]
+
+# ---------- run ----------
+
+class RunBundle(BaseModel):
+    run_id: str
+    meeting_date: date
+    duration_sec: Optional[float] = None
+    status: str = "ok"  # "pending" while segments are still being written, "failed" if that gave up
+    segments: List[SegmentOut]
+    summary: str
+    tasks: List[Task]
+    open_questions: List[str]
+
+# ---------- cached serializers ----------
+# Built once at import; routes dump through these and return the bytes directly,
+# so FastAPI does not validate + serialize the response model a second time.
+
+ANALYZE_ADAPTER = TypeAdapter(AnalyzeResponse)
+ANALYZE_PLAN_ADAPTER = TypeAdapter(AnalyzePlanResponse)
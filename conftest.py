@@ -0,0 +1 @@
+# Lets tests import api / core / store from the repo root.
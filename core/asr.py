@@ -1,13 +1,26 @@
-from typing import List, Optional, Tuple
+from typing import Iterator, List, Optional, Tuple, Union
 from dataclasses import dataclass
+from functools import lru_cache
+from bisect import bisect_left, bisect_right
 import os
-import tempfile
-import subprocess
 
-from faster_whisper import WhisperModel
-from core.vad import ensure_mono16_wav, detect_voice_regions
+import numpy as np
+from core.vad import load_mono16_pcm, detect_voice_regions_pcm
 
-@dataclass
+SAMPLE_RATE = 16000
+
+ASR_MODEL_SIZE = os.getenv("ASR_MODEL_SIZE", "small")
+ASR_BATCH_SIZE = int(os.getenv("ASR_BATCH_SIZE", "8"))  # windows per batched encoder pass, 1 disables batching
+ASR_CPU_THREADS = int(os.getenv("ASR_CPU_THREADS", "0"))  # 0 = one per physical core
+ASR_DEVICE = os.getenv("ASR_DEVICE", "auto")  # auto, cpu or cuda
+ASR_COMPUTE_TYPE = os.getenv("ASR_COMPUTE_TYPE", "")  # empty = int8_float16 on cuda, int8 on cpu
+ASR_LANGUAGE = os.getenv("ASR_LANGUAGE", "") or None  # e.g. "en" pins the language, empty = detect once per file
+REGION_GAP_SEC = 0.2  # silence put between concatenated VAD regions so the decoder sees a pause
+WINDOW_SEC = 30.0  # Whisper's input window; batched clips must not exceed it
+# faster-whisper's internal (Silero) VAD, used when external WebRTC VAD is off
+ASR_VAD_PARAMS = {"threshold": 0.5, "min_silence_duration_ms": 500}
+
+@dataclass(slots=True)  # no per-instance __dict__: one of these per segment, thousands per long file
 class ASRSegment:
     idx: int
     start: float
@@ -16,49 +29,240 @@ class ASRSegment:
     speaker: Optional[str] = None
 
 
+def _to_asr_segments(segments_iter) -> Iterator[ASRSegment]:
+    for i, seg in enumerate(segments_iter):
+        yield ASRSegment(
+            idx=i,
+            start=float(seg.start) if seg.start is not None else 0.0,
+            end=float(seg.end) if seg.end is not None else 0.0,
+            text=seg.text.strip(),
+            speaker=None,
+        )
+
+
+def _pack_windows(regions: List[Tuple[float, float]], max_len: float = WINDOW_SEC) -> List[Tuple[float, float]]:
+    """
+    Group consecutive VAD regions into clips of at most max_len seconds (one
+    Whisper window each), splitting regions that are longer than that.
+    """
+    windows: List[Tuple[float, float]] = []
+    for rs, re in regions:
+        # long regions: emit full windows, the remainder is packed like any region
+        while re - rs > max_len:
+            windows.append((rs, rs + max_len))
+            rs += max_len
+        if windows and re - windows[-1][0] <= max_len:
+            windows[-1] = (windows[-1][0], re)
+        else:
+            windows.append((rs, re))
+    return windows
+
+
 class ASREngine:
     """
     Thin wrapper around faster-whisper.
     Loads the model once and exposes a transcribe() method.
     """
 
-    def __init__(self, model_size: str = "small", device: str = "cpu", compute_type: str = "int8"):
+    def __init__(
+        self,
+        model_size: str = "small",
+        device: str = "cpu",
+        compute_type: str = "int8",
+        cpu_threads: int = 0,
+        num_workers: int = 1,
+        batch_size: int = 1,
+    ):
         """
         model_size: tiny, base, small, medium, large-v2, etc.
         device: cpu or cuda
         compute_type: int8, int8_float16, float16, float32
+        cpu_threads: CTranslate2 intra-op threads, 0 keeps the library default
+        num_workers: parallel transcribe() calls the model accepts; requests already run on their own threads
+        batch_size: > 1 wraps the model in BatchedInferencePipeline for whole-file passes
         """
-        self.model = WhisperModel(model_size, device=device, compute_type=compute_type)
+        # faster_whisper pulls in ctranslate2 + onnxruntime; import on first model load
+        from faster_whisper import WhisperModel, BatchedInferencePipeline
+
+        self.model = WhisperModel(
+            model_size,
+            device=device,
+            compute_type=compute_type,
+            cpu_threads=cpu_threads,
+            num_workers=num_workers,
+        )
+        self.batch_size = batch_size
+        # everything about the engine that changes its output; part of the ASR cache key
+        self.config_tag = f"{model_size}|{device}|{compute_type}|b{batch_size}|{ASR_LANGUAGE or ''}"
+        self.batched = BatchedInferencePipeline(model=self.model) if batch_size > 1 else None
+
+    def _iter_one_file(
+        self,
+        path: Union[str, np.ndarray],  # file path or 16 kHz mono float32 waveform
+        beam_size: int = 5,
+        language: Optional[str] = None,
+        vad_filter: bool = False,   # we set False when using external VAD
+    ) -> Tuple[float, Iterator[ASRSegment]]:
+        """
+        faster-whisper decodes lazily, so segments come out of the returned
+        iterator as they are decoded. Duration is known up front from info.
+        Language is detected once per call (or pinned via ASR_LANGUAGE) and
+        reused for every window; windows are not conditioned on the previous
+        text, which keeps the decoder prompt short.
+        """
+        language = language or ASR_LANGUAGE
+        if vad_filter and self.batched is not None:
+            # batched pipeline needs VAD (or clip timestamps) to cut the file into windows
+            segments_iter, info = self.batched.transcribe(
+                path,
+                batch_size=self.batch_size,
+                vad_filter=True,
+                vad_parameters=ASR_VAD_PARAMS,
+                beam_size=beam_size,
+                language=language,
+                temperature=0.0,
+                best_of=1,
+            )
+        else:
+            segments_iter, info = self.model.transcribe(
+                path,
+                vad_filter=vad_filter,
+                vad_parameters=ASR_VAD_PARAMS if vad_filter else None,
+                beam_size=beam_size,
+                language=language,
+                temperature=0.0,
+                best_of=1,
+                condition_on_previous_text=False,
+            )
+
+        duration_sec = float(info.duration) if info and info.duration else 0.0
+        return duration_sec, _to_asr_segments(segments_iter)
 
     def _transcribe_one_file(
         self,
-        path: str,
+        path: Union[str, np.ndarray],
         beam_size: int = 5,
         language: Optional[str] = None,
         vad_filter: bool = False,   # we set False when using external VAD
     ) -> Tuple[float, List[ASRSegment]]:
-        segments_iter, info = self.model.transcribe(
-            path,
-            vad_filter=vad_filter,
-            beam_size=beam_size,
-            language=language,
-            temperature=0.0,
-            best_of=1,
-        )
-        out: List[ASRSegment] = []
-        for i, seg in enumerate(segments_iter):
-            out.append(
-                ASRSegment(
-                    idx=i,
-                    start=float(seg.start) if seg.start is not None else 0.0,
-                    end=float(seg.end) if seg.end is not None else 0.0,
-                    text=seg.text.strip(),
-                    speaker=None,
-                )
-            )
-        duration_sec = float(info.duration) if info and info.duration else (out[-1].end if out else 0.0)
+        duration_sec, segs_iter = self._iter_one_file(path, beam_size=beam_size, language=language, vad_filter=vad_filter)
+        out = list(segs_iter)
+        if not duration_sec:
+            duration_sec = out[-1].end if out else 0.0
         return duration_sec, out
 
+    def _iter_regions(
+        self,
+        audio: np.ndarray,
+        regions: List[Tuple[float, float]],
+        beam_size: int = 5,
+        language: Optional[str] = None,
+    ) -> Iterator[ASRSegment]:
+        """
+        Transcribe only the VAD regions, in file time.
+        With the batched pipeline, regions are packed into <= 30 s clips and
+        several clips go through each encoder forward (clip_timestamps); the
+        pipeline maps timestamps back itself.
+        Otherwise the regions are concatenated into one voiced-only waveform
+        and ASR runs once over it, so the encoder and language detection are
+        not restarted per region. Timestamps are mapped back to file time
+        through the (merged_start, file_start) offset table.
+        """
+        if self.batched is not None:
+            windows = _pack_windows(regions)
+            if not windows:
+                return
+            segments_iter, _ = self.batched.transcribe(
+                audio,
+                batch_size=self.batch_size,
+                vad_filter=False,
+                clip_timestamps=[{"start": s, "end": e} for s, e in windows],
+                without_timestamps=False,  # segment-level times, not one segment per clip
+                beam_size=beam_size,
+                language=language or ASR_LANGUAGE,
+                temperature=0.0,
+                best_of=1,
+            )
+            yield from _to_asr_segments(segments_iter)
+            return
+
+        gap = np.zeros(int(REGION_GAP_SEC * SAMPLE_RATE), dtype=audio.dtype)
+        parts: List[np.ndarray] = []
+        merged_starts: List[float] = []
+        file_starts: List[float] = []
+        merged_ends: List[float] = []
+        cum = 0
+        for rs, re in regions:
+            chunk = audio[int(rs * SAMPLE_RATE):int(re * SAMPLE_RATE)]
+            if not len(chunk):
+                continue
+            if parts:
+                parts.append(gap)
+                cum += len(gap)
+            merged_starts.append(cum / SAMPLE_RATE)
+            file_starts.append(rs)
+            parts.append(chunk)
+            cum += len(chunk)
+            merged_ends.append(cum / SAMPLE_RATE)
+        if not parts:
+            return
+
+        def to_file_time(t: float, is_end: bool) -> float:
+            # ends that land on a boundary belong to the region before it
+            i = (bisect_left(merged_starts, t) if is_end else bisect_right(merged_starts, t)) - 1
+            i = max(i, 0)
+            if not is_end and t > merged_ends[i] and i + 1 < len(merged_starts):
+                return file_starts[i + 1]  # start inside a gap snaps to the next region
+            # times that fall in an inserted gap clamp to the region edge
+            return file_starts[i] + min(max(t - merged_starts[i], 0.0), merged_ends[i] - merged_starts[i])
+
+        _, segs = self._iter_one_file(np.concatenate(parts), beam_size=beam_size, language=language, vad_filter=False)
+        idx = 0
+        for s in segs:
+            start = to_file_time(s.start, False)
+            end = to_file_time(s.end, True)
+            if end <= start:
+                continue  # segment fell entirely inside an inserted gap
+            s.idx, s.start, s.end = idx, start, end  # renumber so idx stays contiguous
+            idx += 1
+            yield s
+
+    def stream_file(
+        self,
+        path: str,
+        *,
+        use_ext_vad: bool = True,
+        vad_aggr: int = 2,
+        beam_size: int = 5,
+        language: Optional[str] = None,
+    ) -> Tuple[float, Iterator[ASRSegment]]:
+        """
+        Like transcribe_file, but returns (duration_sec, iterator) and yields
+        segments as they are decoded instead of collecting them first.
+        VAD and region detection happen eagerly, so failures there still fall
+        back to whole-file ASR; errors while decoding propagate to the caller.
+        """
+        if not use_ext_vad:
+            return self._iter_one_file(path, beam_size=beam_size, language=language, vad_filter=True)
+
+        try:
+            # 1) Decode once into 16k mono int16 in memory; VAD and every region slice share it
+            pcm = load_mono16_pcm(path)
+
+            # 2) Detect speech regions
+            regions = detect_voice_regions_pcm(pcm, SAMPLE_RATE, aggressiveness=vad_aggr)
+        except Exception:
+            return self._iter_one_file(path, beam_size=beam_size, language=language, vad_filter=False)
+
+        if not regions:
+            # Fallback to plain ASR on the full file
+            return self._iter_one_file(path, beam_size=beam_size, language=language, vad_filter=False)
+
+        # 3) Transcribe regions straight from the array, no ffmpeg or temp file per region
+        audio = pcm.astype(np.float32) / 32768.0
+        duration_sec = max(re for _, re in regions)
+        return duration_sec, self._iter_regions(audio, regions, beam_size=beam_size, language=language)
+
     def transcribe_file(
         self,
         path: str,
@@ -77,68 +281,94 @@ class ASREngine:
             # Current behavior, keep internal VAD if you want it
             return self._transcribe_one_file(path, beam_size=beam_size, language=language, vad_filter=True)
 
-        tmp_wav = None
         try:
-            # 1) Prepare a clean mono 16k wav for VAD
-            wav_path = ensure_mono16_wav(path)
-            if wav_path != path:
-                tmp_wav = wav_path
+            duration_sec, segs_iter = self.stream_file(
+                path, use_ext_vad=True, vad_aggr=vad_aggr, beam_size=beam_size, language=language,
+            )
+            all_segments = list(segs_iter)
+            return (duration_sec if all_segments else 0.0), all_segments
+        except Exception:
+            # Any issue with VAD or slicing falls back to whole-file ASR
+            return self._transcribe_one_file(path, beam_size=beam_size, language=language, vad_filter=False)
 
-            # 2) Detect speech regions
-            regions = detect_voice_regions(wav_path, aggressiveness=vad_aggr)
+
+    def transcribe_array(
+        self,
+        audio: np.ndarray,
+        *,
+        use_ext_vad: bool = True,
+        vad_aggr: int = 2,
+        beam_size: int = 5,
+        language: Optional[str] = None,
+    ) -> Tuple[float, List[ASRSegment]]:
+        """
+        Transcribe an already decoded 16 kHz mono float32 waveform (see decode_audio).
+        Same output as transcribe_file, but VAD regions are sliced straight out of
+        the array, so there is no ffmpeg call or temp file per region.
+        """
+        if not use_ext_vad:
+            return self._transcribe_one_file(audio, beam_size=beam_size, language=language, vad_filter=True)
+
+        try:
+            pcm = (np.clip(audio, -1.0, 1.0) * 32767.0).astype(np.int16)
+            regions = detect_voice_regions_pcm(pcm, SAMPLE_RATE, aggressiveness=vad_aggr)
             if not regions:
-                # Fallback to plain ASR on the full file
-                return self._transcribe_one_file(path, beam_size=beam_size, language=language, vad_filter=False)
-
-            all_segments: List[ASRSegment] = []
-            idx = 0
-            max_end = 0.0
-
-            # 3) Slice and transcribe per region
-            for rs, re in regions:
-                max_end = max(max_end, re)
-                slice_tmp = tempfile.NamedTemporaryFile(suffix=".wav", delete=False)
-                slice_tmp.close()
-                slice_path = slice_tmp.name
-
-                # ffmpeg slice
-                subprocess.run(
-                    [
-                        "ffmpeg", "-nostats", "-loglevel", "error",
-                        "-y", "-ss", f"{rs:.2f}", "-to", f"{re:.2f}",
-                        "-i", wav_path, "-ac", "1", "-ar", "16000", slice_path
-                    ],
-                    check=True,
-                )
-
-                _, segs = self._transcribe_one_file(slice_path, beam_size=beam_size, language=language, vad_filter=False)
-                os.unlink(slice_path)
-
-                # offset timings, reindex
-                for s in segs:
-                    s.start = rs + s.start
-                    s.end = rs + s.end
-                    s.idx = idx
-                    idx += 1
-                    all_segments.append(s)
-
-            duration_sec = max_end if all_segments else 0.0
+                # Fallback to plain ASR on the full waveform
+                return self._transcribe_one_file(audio, beam_size=beam_size, language=language, vad_filter=False)
+
+            all_segments = list(self._iter_regions(audio, regions, beam_size=beam_size, language=language))
+            duration_sec = max(re for _, re in regions) if all_segments else 0.0
             return duration_sec, all_segments
 
         except Exception:
-            # Any issue with VAD or slicing falls back to whole-file ASR
-            return self._transcribe_one_file(path, beam_size=beam_size, language=language, vad_filter=False)
-        finally:
-            if tmp_wav and os.path.exists(tmp_wav):
-                os.unlink(tmp_wav)
+            # Any issue with VAD or slicing falls back to whole-waveform ASR
+            return self._transcribe_one_file(audio, beam_size=beam_size, language=language, vad_filter=False)
+
 
+def load_audio(path: str) -> np.ndarray:
+    """Decode any input to a 16 kHz mono float32 waveform, shared by ASR and diarization."""
+    from faster_whisper import decode_audio
+    return decode_audio(path, sampling_rate=SAMPLE_RATE)
 
-# Simple singleton holder so we do not reload the model per request
-_asr_singleton: Optional[ASREngine] = None
 
+def _physical_cores() -> int:
+    # hyperthreads do not add int8 GEMM throughput, so size CTranslate2 to real cores
+    try:
+        import psutil
+        n = psutil.cpu_count(logical=False)
+        if n:
+            return n
+    except Exception:
+        pass
+    return os.cpu_count() or 1
+
+
+def _cuda_available() -> bool:
+    try:
+        import ctranslate2
+        return ctranslate2.get_cuda_device_count() > 0
+    except Exception:
+        return False
+
+
+# Process-wide instance so we do not reload the model per request
+@lru_cache(maxsize=1)
 def get_asr() -> ASREngine:
-    global _asr_singleton
-    if _asr_singleton is None:
-        # Defaults are CPU friendly. You can change size to base or medium if your box is fast.
-        _asr_singleton = ASREngine(model_size="small", device="cpu", compute_type="int8")
-    return _asr_singleton
+    # int8 weights on CPU, int8 weights + fp16 compute on GPU.
+    # Set ASR_MODEL_SIZE to base or medium depending on how fast your box is.
+    device = ASR_DEVICE if ASR_DEVICE in ("cpu", "cuda") else ("cuda" if _cuda_available() else "cpu")
+    if device == "cuda":
+        return ASREngine(
+            model_size=ASR_MODEL_SIZE,
+            device="cuda",
+            compute_type=ASR_COMPUTE_TYPE or "int8_float16",
+            batch_size=ASR_BATCH_SIZE,
+        )
+    return ASREngine(
+        model_size=ASR_MODEL_SIZE,
+        device="cpu",
+        compute_type=ASR_COMPUTE_TYPE or "int8",
+        cpu_threads=ASR_CPU_THREADS or _physical_cores(),
+        num_workers=1,
+        batch_size=ASR_BATCH_SIZE,
+    )
@@ -1,11 +1,23 @@
-from typing import List, Dict, Optional, Tuple
+from typing import TYPE_CHECKING, List, Dict, Optional, Tuple, Union
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
 import os
 import re
-from pyannote.audio import Pipeline
+import numpy as np
 
-_RE_INTRO = re.compile(
-    r"\b(?:my name is|this is|i am|i'm)\s+([A-Z][a-z]{1,30})\b",
-    flags=re.IGNORECASE,
+if TYPE_CHECKING:
+    from pyannote.audio import Pipeline
+
+try:
+    import re2 as _intro_re  # optional: google-re2, linear-time matching without backtracking
+except ImportError:
+    _intro_re = re
+
+# One combined pattern, compiled once. Alternatives are prefix-factored
+# ("i am" / "i'm" / "im" share the "i") so the engine does not retry each
+# phrase from scratch at every position. Inline (?i) so both engines accept it.
+_RE_INTRO = _intro_re.compile(
+    r"(?i)\b(?:my\s+name\s+is|this\s+is|i(?:\s+am|'m|\s?m))\s+([A-Z][a-z]{1,30})\b"
 )
 
 def build_speaker_name_map(segments, max_scan=20):
@@ -25,7 +37,12 @@ def build_speaker_name_map(segments, max_scan=20):
             return s
         return None
 
-    for seg in segments[:max_scan]:
+    window = segments[:max_scan]
+    pending = {seg.get("speaker") for seg in window if seg.get("speaker")}
+
+    for seg in window:
+        if not pending:
+            break  # every speaker in the window already has a name
         spk = seg.get("speaker")
         txt = seg.get("text", "") or ""
         if not spk or spk in name_by_spk:
@@ -37,6 +54,7 @@ def build_speaker_name_map(segments, max_scan=20):
             if name not in seen_names:
                 name_by_spk[spk] = name
                 seen_names.add(name)
+                pending.discard(spk)
                 continue
 
         # fallback: single capitalized word as a standalone intro
@@ -45,6 +63,7 @@ def build_speaker_name_map(segments, max_scan=20):
             if guess and guess not in seen_names:
                 name_by_spk[spk] = guess
                 seen_names.add(guess)
+                pending.discard(spk)
 
     return name_by_spk
 
@@ -60,30 +79,145 @@ def apply_name_map(segments, name_map):
         out.append({**seg, "speaker": label})
     return out
 
+DIARIZE_DEVICE = os.getenv("DIARIZE_DEVICE", "auto")  # auto, cpu, cuda, mps
+DIARIZE_FP16 = os.getenv("DIARIZE_FP16", "1") == "1"  # fp16 autocast on CUDA (tensor cores)
+DIARIZE_SKIP_SILENCE = os.getenv("DIARIZE_SKIP_SILENCE", "1") == "1"  # only embed the VAD-voiced audio
+SILENCE_GAP_SEC = 0.5  # silence kept between voiced regions so pyannote still sees a break
+MIN_SILENCE_FRACTION = 0.1  # below this much silence, cutting it is not worth the VAD pass
+
 # Cache the pipeline so we do not re-load per request
-_diar_pipeline: Optional[Pipeline] = None
+_diar_pipeline: Optional["Pipeline"] = None
+
 
-def get_diar_pipeline() -> Pipeline:
+def _diar_device():
+    import torch
+    if DIARIZE_DEVICE != "auto":
+        return torch.device(DIARIZE_DEVICE)
+    if torch.cuda.is_available():
+        return torch.device("cuda")
+    if getattr(torch.backends, "mps", None) is not None and torch.backends.mps.is_available():
+        return torch.device("mps")
+    return torch.device("cpu")
+
+def get_diar_pipeline() -> "Pipeline":
     global _diar_pipeline
     if _diar_pipeline is None:
+        # pyannote drags in torch / lightning; import only when diarization is first used
+        from pyannote.audio import Pipeline
+
         token = os.getenv("HUGGINGFACE_TOKEN")
         if not token:
             raise RuntimeError("HUGGINGFACE_TOKEN env var not set. Get a free token at huggingface.co and export it.")
         # This pipeline does VAD + segmentation + clustering
-        _diar_pipeline = Pipeline.from_pretrained(
+        pipeline = Pipeline.from_pretrained(
             "pyannote/speaker-diarization-3.1",
             use_auth_token=token,
         )
+        # from_pretrained always loads on CPU
+        device = _diar_device()
+        if device.type != "cpu":
+            pipeline.to(device)
+        print(f"[diarize] pipeline on {device}")
+        _diar_pipeline = pipeline
     return _diar_pipeline
 
+def preload_diar_pipeline():
+    """
+    Load the pipeline in a parent process that is about to fork workers
+    (gunicorn --preload), so every worker shares the weight pages copy-on-write
+    instead of reading and holding its own copy. CPU only: CUDA/MPS state does
+    not survive fork, so GPU workers keep loading lazily.
+    """
+    device = _diar_device()
+    if device.type != "cpu":
+        print(f"[diarize] preload skipped on {device}; each worker loads its own pipeline")
+        return
+    get_diar_pipeline()
+
+
+def _squeeze_silence(wav: np.ndarray, sr: int):
+    """
+    Cut the silence between VAD regions out of wav, leaving SILENCE_GAP_SEC between
+    regions. Returns (voiced waveform, timeline for _to_file_time), or None when
+    there is too little silence to bother (or webrtcvad is missing).
+    """
+    try:
+        from core.vad import detect_voice_regions_pcm
+    except ImportError:
+        return None
+    pcm = (np.clip(wav, -1.0, 1.0) * 32767).astype(np.int16)
+    regions = detect_voice_regions_pcm(pcm, sr)
+    voiced_sec = sum(e - s for s, e in regions)
+    if not regions or voiced_sec >= (1.0 - MIN_SILENCE_FRACTION) * len(wav) / sr:
+        return None
+
+    gap = np.zeros(int(SILENCE_GAP_SEC * sr), dtype=np.float32)
+    parts: List[np.ndarray] = []
+    merged_starts: List[float] = []
+    merged_ends: List[float] = []
+    file_starts: List[float] = []
+    cum = 0
+    for rs, re_ in regions:
+        chunk = wav[int(rs * sr):int(re_ * sr)]
+        if not len(chunk):
+            continue
+        if parts:
+            parts.append(gap)
+            cum += len(gap)
+        merged_starts.append(cum / sr)
+        file_starts.append(rs)
+        parts.append(chunk)
+        cum += len(chunk)
+        merged_ends.append(cum / sr)
+    if not parts:
+        return None
+    voiced = np.ascontiguousarray(np.concatenate(parts), dtype=np.float32)
+    return voiced, (merged_starts, merged_ends, file_starts)
+
+
+def _to_file_time(timeline, t: float, is_end: bool) -> float:
+    """Map a time in the squeezed waveform back to the original file (same rules as core.asr)."""
+    merged_starts, merged_ends, file_starts = timeline
+    # ends that land on a boundary belong to the region before it
+    i = (bisect_left(merged_starts, t) if is_end else bisect_right(merged_starts, t)) - 1
+    i = max(i, 0)
+    if not is_end and t > merged_ends[i] and i + 1 < len(merged_starts):
+        return file_starts[i + 1]  # start inside a gap snaps to the next region
+    # times that fall in an inserted gap clamp to the region edge
+    return file_starts[i] + min(max(t - merged_starts[i], 0.0), merged_ends[i] - merged_starts[i])
 
-def diarize_file(path: str) -> List[Dict]:
+
+def diarize_file(path: Union[str, np.ndarray]) -> List[Dict]:
     """
     Returns a list of diarization turns:
     [{"speaker": "S0", "start": float_sec, "end": float_sec}]
+    path may also be an already decoded 16 kHz mono float32 waveform.
     """
+    import torch
     pipeline = get_diar_pipeline()
-    diar = pipeline(path)
+    # Always hand pyannote an in-memory waveform: given a path it re-opens and
+    # crops the file through torchaudio for every chunk it embeds
+    if isinstance(path, str):
+        from pyannote.audio import Audio
+        waveform, sr = Audio(mono="downmix", sample_rate=16000)(path)  # decode once
+    else:
+        waveform = torch.from_numpy(np.ascontiguousarray(path, dtype=np.float32)).unsqueeze(0)  # (channel, time)
+        sr = 16000
+    timeline = None
+    if DIARIZE_SKIP_SILENCE:
+        squeezed = _squeeze_silence(waveform[0].numpy(), sr)
+        if squeezed is not None:
+            voiced, timeline = squeezed
+            waveform = torch.from_numpy(voiced).unsqueeze(0)
+    device = getattr(pipeline, "device", None)
+    if device is not None:
+        waveform = waveform.to(device)
+    if DIARIZE_FP16 and device is not None and device.type == "cuda":
+        # embedding extraction dominates; fp16 matmuls run on tensor cores
+        with torch.autocast("cuda", dtype=torch.float16):
+            diar = pipeline({"waveform": waveform, "sample_rate": sr})
+    else:
+        diar = pipeline({"waveform": waveform, "sample_rate": sr})
     # Map speaker labels to S0, S1, ...
     # pyannote labels: "SPEAKER_00"
     mapping = {}
@@ -91,14 +225,20 @@ def diarize_file(path: str) -> List[Dict]:
     next_id = 0
 
     for speech_turn, _, speaker in diar.itertracks(yield_label=True):
+        start, end = float(speech_turn.start), float(speech_turn.end)
+        if timeline is not None:
+            start = _to_file_time(timeline, start, False)
+            end = _to_file_time(timeline, end, True)
+            if end <= start:
+                continue  # turn fell entirely inside an inserted gap
         if speaker not in mapping:
             mapping[speaker] = f"S{next_id}"
             next_id += 1
         spk = mapping[speaker]
         turns.append({
             "speaker": spk,
-            "start": float(speech_turn.start),
-            "end": float(speech_turn.end),
+            "start": start,
+            "end": end,
         })
 
     # Sort by start time
@@ -106,6 +246,88 @@ def diarize_file(path: str) -> List[Dict]:
     return turns
 
 
+prange = range  # rebound to numba.prange by _numba_best_turns before the kernel is compiled
+
+def _best_turns(seg_s, seg_e, turn_s, turn_e, max_end):
+    """
+    For each segment, index of the turn with the largest overlap (-1 if none) and
+    that overlap. turn_s is sorted; max_end is the running max of turn_e, so both
+    bounds are binary searches and only turns that can overlap are visited.
+    Ties keep the earliest turn, like the original nested loop.
+    Kernel source for numba; see _numba_best_turns.
+    """
+    n = seg_s.shape[0]
+    best_idx = np.empty(n, dtype=np.int64)
+    best_ol = np.empty(n, dtype=np.float64)
+    for i in prange(n):
+        s0 = seg_s[i]
+        e0 = seg_e[i]
+        lo = np.searchsorted(max_end, s0, side="right")  # every earlier turn ends by s0
+        hi = np.searchsorted(turn_s, e0, side="left")    # every later turn starts at/after e0
+        b = 0.0
+        bi = -1
+        for j in range(lo, hi):
+            olap = min(e0, turn_e[j]) - max(s0, turn_s[j])
+            if olap > b:
+                b = olap
+                bi = j
+        best_idx[i] = bi
+        best_ol[i] = b
+    return best_idx, best_ol
+
+
+@lru_cache(maxsize=1)
+def _numba_best_turns():
+    """
+    _best_turns compiled with numba, or None when numba is missing (the NumPy
+    version is used instead). Resolved on the first alignment, not at import, so
+    importing this module does not pay numba / llvmlite startup.
+    """
+    global prange
+    try:
+        from numba import njit, prange as numba_prange
+    except Exception:
+        return None
+    prange = numba_prange
+    return njit(cache=True, parallel=True)(_best_turns)
+
+
+OVERLAP_BLOCK_CELLS = 4_000_000  # segment x candidate-turn cells per block (~32 MB of float64)
+
+def _best_turns_np(seg_s, seg_e, turn_s, turn_e, max_end):
+    """
+    Same result as _best_turns, vectorized with NumPy. Both binary-search
+    bounds are computed for all segments at once; each segment then only
+    scores the band of turns [lo, hi) that can overlap it, so long meetings
+    cost O(N * band) instead of a full N x M overlap matrix. argmax keeps
+    the first max, so ties still go to the earliest turn.
+    """
+    n = seg_s.shape[0]
+    best_idx = np.full(n, -1, dtype=np.int64)
+    best_ol = np.zeros(n, dtype=np.float64)
+    lo = np.searchsorted(max_end, seg_s, side="right")
+    hi = np.searchsorted(turn_s, seg_e, side="left")
+    width = int((hi - lo).max(initial=0))
+    if width <= 0:
+        return best_idx, best_ol
+    offs = np.arange(width)
+    block = max(1, OVERLAP_BLOCK_CELLS // width)
+    for i0 in range(0, n, block):
+        b_lo = lo[i0:i0 + block, None]
+        j = b_lo + offs                                   # candidate turn per (segment, k)
+        valid = j < hi[i0:i0 + block, None]
+        j = np.minimum(j, turn_s.shape[0] - 1)
+        ol = np.minimum(seg_e[i0:i0 + block, None], turn_e[j]) - np.maximum(seg_s[i0:i0 + block, None], turn_s[j])
+        ol = np.where(valid, ol, -np.inf)
+        k = ol.argmax(axis=1)
+        rows = np.arange(k.shape[0])
+        b = ol[rows, k]
+        hit = b > 0
+        best_idx[i0:i0 + block] = np.where(hit, j[rows, k], -1)
+        best_ol[i0:i0 + block] = np.where(hit, b, 0.0)
+    return best_idx, best_ol
+
+
 def assign_speakers_to_segments(
     segments: List[Dict],
     turns: List[Dict],
@@ -115,21 +337,24 @@ def assign_speakers_to_segments(
     For each ASR segment with [start,end], assign the speaker with max time overlap.
     If max overlap < min_overlap seconds, keep speaker as None.
     """
+    if not segments or not turns:
+        return list(segments)
+
+    # Struct-of-arrays view of the records: the kernels only touch these float64 columns
+    n_t, n_s = len(turns), len(segments)
+    order = sorted(range(n_t), key=lambda k: turns[k]["start"])
+    turn_s = np.fromiter((turns[k]["start"] for k in order), dtype=np.float64, count=n_t)
+    turn_e = np.fromiter((turns[k]["end"] for k in order), dtype=np.float64, count=n_t)
+    seg_s = np.fromiter((seg["start"] for seg in segments), dtype=np.float64, count=n_s)
+    seg_e = np.fromiter((seg["end"] for seg in segments), dtype=np.float64, count=n_s)
+
+    max_end = np.maximum.accumulate(turn_e)
+    best_turns = _numba_best_turns() or _best_turns_np
+    best_idx, best_ol = best_turns(seg_s, seg_e, turn_s, turn_e, max_end)
+
     out = []
-    for seg in segments:
-        s0, e0 = float(seg["start"]), float(seg["end"])
-        best_spk = None
-        best_olap = 0.0
-        for tr in turns:
-            s1, e1 = tr["start"], tr["end"]
-            # overlap
-            start = max(s0, s1)
-            end = min(e0, e1)
-            olap = max(0.0, end - start)
-            if olap > best_olap:
-                best_olap = olap
-                best_spk = tr["speaker"]
-        if best_spk is not None and best_olap >= min_overlap:
-            seg = {**seg, "speaker": best_spk}
+    for seg, bi, bo in zip(segments, best_idx, best_ol):
+        if bi >= 0 and bo >= min_overlap:
+            seg = {**seg, "speaker": turns[order[bi]]["speaker"]}
         out.append(seg)
     return out
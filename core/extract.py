@@ -1,50 +1,177 @@
 from __future__ import annotations
 import re
 import os
-import json
+import hashlib
+import sqlite3
 import textwrap
-from typing import Any, Dict, List, Optional, Tuple
+import threading
+from collections import OrderedDict
+import time as _time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 from datetime import date, datetime, timedelta, time
+from functools import lru_cache
+import orjson
 import requests
-import dateparser
-try:
-    import spacy
-    _NLP = spacy.load("en_core_web_sm")
-except Exception:
-    _NLP = None
+
+@lru_cache(maxsize=1)
+def _get_nlp():
+    # spaCy model load is slow; do it on first name extraction, not at import.
+    # Only NER is used, so the other pipes are not loaded.
+    try:
+        import spacy
+        return spacy.load("en_core_web_sm", disable=["tagger", "parser", "attribute_ruler", "lemmatizer"])
+    except Exception:
+        return None
 
 _PERSON_RE = re.compile(r"\b([A-Z][a-z]{2,})\b")
+# spaCy NER over the whole transcript is the slow path; only used when asked for
+USE_SPACY = os.getenv("USE_SPACY", "0") == "1"
+# unnamed diarization labels (S1, S2, ...) are not names
+_DIAR_LABEL_RE = re.compile(r"S\d+")
+
+try:
+    import ahocorasick  # optional: pyahocorasick
+except ImportError:
+    ahocorasick = None
 # Point to running Ollama server
 OLLAMA_URL = os.getenv("OLLAMA_URL", "http://127.0.0.1:11434/api/generate")
 DEFAULT_MODEL = os.getenv("ANALYZER_MODEL", "mistral:7b")
+# chunk prompts in flight at once; Ollama also needs OLLAMA_NUM_PARALLEL >= this to overlap them
+OLLAMA_CONCURRENCY = int(os.getenv("OLLAMA_CONCURRENCY", "4"))
+
+# One pooled keep-alive session for every Ollama call instead of a new connection per chunk;
+# the pool is sized so concurrent chunk requests do not evict each other's connections
+_SESSION = requests.Session()
+_SESSION.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=max(OLLAMA_CONCURRENCY, 10)))
+_SESSION.mount("https://", requests.adapters.HTTPAdapter(pool_maxsize=max(OLLAMA_CONCURRENCY, 10)))
 
 class LLMError(RuntimeError):
     pass
 
+# Raw Ollama responses cached on disk by (model, temperature, format, prompt), so
+# re-analyzing the same transcript or retrying a request skips the model
+LLM_CACHE = os.getenv("LLM_CACHE", "1") == "1"  # set to 0 to always call Ollama
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "data/llm_cache.sqlite")
+LLM_CACHE_MAX_ROWS = int(os.getenv("LLM_CACHE_MAX_ROWS", "5000"))  # least recently used rows go first
+
+
+def _llm_cache_conn() -> sqlite3.Connection:
+    # one short-lived connection per call: chunk prompts run on several threads
+    os.makedirs(os.path.dirname(LLM_CACHE_PATH) or ".", exist_ok=True)
+    conn = sqlite3.connect(LLM_CACHE_PATH, timeout=5)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, response TEXT NOT NULL, used_at REAL NOT NULL)")
+    return conn
+
+
+def _llm_cache_key(model: str, temperature: float, request_json: bool, prompt: str) -> str:
+    return hashlib.sha256(f"{model}\n{temperature}\n{int(request_json)}\n{prompt}".encode("utf-8")).hexdigest()
+
+
+def _llm_cache_get(key: str) -> Optional[str]:
+    try:
+        conn = _llm_cache_conn()
+        try:
+            with conn:
+                row = conn.execute("SELECT response FROM llm_cache WHERE key = ?", (key,)).fetchone()
+                if row:
+                    conn.execute("UPDATE llm_cache SET used_at = ? WHERE key = ?", (_time.time(), key))
+            return row[0] if row else None
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        print(f"[llm_cache] read failed: {e}")
+        return None
+
+
+def _llm_cache_put(key: str, response: str):
+    try:
+        conn = _llm_cache_conn()
+        try:
+            with conn:
+                conn.execute("INSERT OR REPLACE INTO llm_cache (key, response, used_at) VALUES (?, ?, ?)", (key, response, _time.time()))
+                conn.execute(
+                    "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+                    (LLM_CACHE_MAX_ROWS,),
+                )
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        # a cache write must never fail the analysis
+        print(f"[llm_cache] store failed: {e}")
+
+
+class _JsonEndScanner:
+    """Tracks brace depth across streamed pieces (ignoring braces inside strings) to spot the end of the top-level object."""
+    def __init__(self):
+        self.depth = 0
+        self.started = False
+        self.in_str = False
+        self.escape = False
+
+    def feed(self, piece: str) -> bool:
+        for ch in piece:
+            if self.in_str:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_str = False
+            elif ch == '"':
+                self.in_str = self.started
+            elif ch == "{":
+                self.depth += 1
+                self.started = True
+            elif ch == "}" and self.started:
+                self.depth -= 1
+                if self.depth == 0:
+                    return True
+        return False
+
 
 def _ollama_generate(prompt: str, model: str = DEFAULT_MODEL, temperature: float = 0.2, request_json: bool = True) -> str:
     """
     One-shot call to Ollama. If request_json=True, we add format:'json'.
     If that yields an empty response, retry once without the format hint.
     Any Ollama 'error' comes back as LLMError so the API can return 502.
+    The response is streamed; in JSON mode we hang up as soon as the top-level
+    object closes instead of waiting for whatever the model pads after it.
+    Non-empty responses are cached on disk (LLM_CACHE) by model + prompt.
     """
+    cache_key = _llm_cache_key(model, temperature, request_json, prompt) if LLM_CACHE else None
+    if cache_key:
+        cached = _llm_cache_get(cache_key)
+        if cached is not None:
+            return cached
+
     payload = {
         "model": model,
         "prompt": prompt,
         "temperature": temperature,
-        "stream": False,
+        "stream": True,
     }
     if request_json:
         payload["format"] = "json"
 
-    r = requests.post(OLLAMA_URL, json=payload, timeout=180)
-    r.raise_for_status()
-    data = r.json()
-
-    if isinstance(data, dict) and data.get("error"):
-        raise LLMError(f"Ollama error: {data['error']}")
+    parts: List[str] = []
+    scanner = _JsonEndScanner() if request_json else None
+    # leaving the with-block closes the connection, which also stops generation server-side
+    with _SESSION.post(OLLAMA_URL, json=payload, timeout=180, stream=True) as r:
+        r.raise_for_status()
+        for line in r.iter_lines():
+            if not line:
+                continue
+            data = orjson.loads(line)
+            if isinstance(data, dict) and data.get("error"):
+                raise LLMError(f"Ollama error: {data['error']}")
+            piece = data.get("response") or ""
+            parts.append(piece)
+            if data.get("done") or (scanner is not None and scanner.feed(piece)):
+                break
 
-    text = (data.get("response") or "").strip()
+    text = "".join(parts).strip()
 
     # If empty and we asked for JSON, retry once without the JSON hint
     if not text and request_json:
@@ -55,6 +182,8 @@ def _ollama_generate(prompt: str, model: str = DEFAULT_MODEL, temperature: float
 
     if not text:
         raise LLMError("Empty response from model.")
+    if cache_key:
+        _llm_cache_put(cache_key, text)
     return text
 
 
@@ -114,7 +243,7 @@ def _keep_questions_only(items: List[str]) -> List[str]:
 
 def _parse_json_or_empty(s: str) -> Dict[str, Any]:
     def _load(txt: str) -> Dict[str, Any]:
-        obj = json.loads(txt)
+        obj = orjson.loads(txt)  # accepts str directly
         # normalize a bit
         obj["summary"] = (obj.get("summary") or "").strip()
         obj["open_questions"] = _keep_questions_only(obj.get("open_questions") or [])
@@ -131,61 +260,143 @@ def _parse_json_or_empty(s: str) -> Dict[str, Any]:
                 pass
         return {"summary": "", "tasks": [], "open_questions": []}
 
-def chunk_segments_to_text(segments: List[Dict[str, Any]], max_chars: int = 1200) -> List[str]:
-    chunks, cur, cur_len = [], [], 0
+def iter_segment_chunks(segments: List[Dict[str, Any]], max_chars: int = 1200) -> Iterator[str]:
+    """Yield prompt-sized chunks of segment text as soon as each one is full."""
+    cur, cur_len = [], 0
     for seg in segments:
         t = seg.get("text") or ""
         if not t:
             continue
-        if cur_len + len(t) > max_chars and cur:
-            chunks.append(" ".join(cur))
+        n = len(t)
+        if cur_len + n > max_chars and cur:
+            yield " ".join(cur)
             cur, cur_len = [], 0
         cur.append(t)
-        cur_len += len(t) + 1
+        cur_len += n + 1
     if cur:
-        chunks.append(" ".join(cur))
-    return chunks
+        yield " ".join(cur)
+
+def chunk_segments_to_text(segments: List[Dict[str, Any]], max_chars: int = 1200) -> List[str]:
+    return list(iter_segment_chunks(segments, max_chars))
 
 _FILLER_TITLES = {
     "follow up", "follow-up", "sync up", "circle back",
     "review", "discuss", "research", "investigate"
 }
 
+_VERBS_RE = re.compile(r"\b(ship|create|draft|write|review|prepare|implement|integrate|deploy|fix|document|outline|summarize|plan|schedule|gather|research)\b")
+_NON_ALPHA_RE = re.compile(r"[^a-zA-Z ]+")
+_WORD3_RE = re.compile(r"[a-zA-Z]{3,}")
+
 def _is_task_plausible(t: dict, transcript_text: str) -> bool:
     title = (t.get("title") or "").strip()
     if len(title) < 4:
         return False
 
     # allow if there is any action verb anywhere, else fallback to len+overlap
-    verbs = r"\b(ship|create|draft|write|review|prepare|implement|integrate|deploy|fix|document|outline|summarize|plan|schedule|gather|research)\b"
-    if not re.search(verbs, title.lower()):
+    if not _VERBS_RE.search(title.lower()):
         # still allow if content words overlap transcript
-        simple = re.sub(r"[^a-zA-Z ]+", "", title).lower().strip()
+        simple = _NON_ALPHA_RE.sub("", title).lower().strip()
         if simple in _FILLER_TITLES:
             return False
-        words = [w for w in re.findall(r"[a-zA-Z]{3,}", simple) if w not in _FILLER_TITLES]
-        if words and sum(1 for w in words if w in transcript_text.lower()) == 0:
-            return False
+        words = [w for w in _WORD3_RE.findall(simple) if w not in _FILLER_TITLES]
+        if words:
+            transcript_lower = transcript_text.lower()  # once per task, not once per word
+            if not any(w in transcript_lower for w in words):
+                return False
     return True
 
+TASK_DUP_THRESHOLD = 0.8  # Jaccard similarity of title shingles above which two tasks are the same
+_TITLE_STOPWORDS = {"a", "an", "the", "to", "for", "of", "on", "and", "our", "up"}
+_TITLE_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+try:
+    from datasketch import MinHash, MinHashLSH  # optional: LSH instead of comparing every pair
+except ImportError:
+    MinHash = MinHashLSH = None
+
+def _title_key(title: str) -> str:
+    # "Send the report." and "send report" normalize to the same key
+    return " ".join(w for w in _TITLE_TOKEN_RE.findall(title.lower()) if w not in _TITLE_STOPWORDS)
+
+def _shingles(key: str, k: int = 3) -> set:
+    return {key[i:i + k] for i in range(max(len(key) - k + 1, 1))}
+
+def _dedupe_tasks(tasks: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[str, str]]:
+    """
+    Drop repeated tasks, keeping the first. Exact match on the normalized title first,
+    then near duplicates by 3-char shingle similarity (MinHash LSH with datasketch).
+    Returns (kept tasks, {dropped title: kept title}).
+    """
+    kept: List[Dict[str, Any]] = []
+    alias: Dict[str, str] = {}
+    by_key: Dict[str, str] = {}
+    lsh = MinHashLSH(threshold=TASK_DUP_THRESHOLD, num_perm=64) if MinHashLSH is not None else None
+    kept_shingles: List[Tuple[set, str]] = []
+
+    for t in tasks:
+        title = t["title"]
+        key = _title_key(title) or title.lower()
+        if key in by_key:
+            alias.setdefault(title, by_key[key])
+            continue
+        sh = _shingles(key)
+        dup_of: Optional[str] = None
+        if lsh is not None:
+            mh = MinHash(num_perm=64)
+            for g in sh:
+                mh.update(g.encode())
+            hits = lsh.query(mh)
+            if hits:
+                dup_of = hits[0]
+        else:
+            # a handful of tasks per meeting: comparing against each kept one is cheap
+            for other, other_title in kept_shingles:
+                if len(sh & other) / len(sh | other) >= TASK_DUP_THRESHOLD:
+                    dup_of = other_title
+                    break
+        if dup_of is not None:
+            by_key[key] = dup_of
+            alias.setdefault(title, dup_of)
+            continue
+
+        by_key[key] = title
+        kept.append(t)
+        if lsh is not None:
+            lsh.insert(title, mh)
+        else:
+            kept_shingles.append((sh, title))
+    return kept, alias
+
+def _extract_chunk(meeting_date: date, tx: str, speakers: List[str], model: str) -> Dict[str, Any]:
+    prompt = _build_prompt(meeting_date, tx, speakers)
+    raw = _ollama_generate(prompt, model=model, temperature=0.2, request_json=True)
+    obj = _parse_json_or_empty(raw)
+    if (_looks_truncated(obj.get("summary")) or (not obj.get("summary") and not obj.get("tasks"))):
+        # one retry with an explicit instruction
+        retry_prompt = prompt + "\n\nReturn valid JSON only. No notes."
+        raw = _ollama_generate(retry_prompt, model=model, temperature=0.2, request_json=True)
+        obj = _parse_json_or_empty(raw)
+    return obj
+
 def extract_plan(meeting_date: date, segments: List[Dict[str, Any]], model: str = DEFAULT_MODEL) -> Dict[str, Any]:
-    texts = chunk_segments_to_text(segments)
     speakers = sorted({(s.get("speaker") or "").strip() for s in segments if s.get("speaker")})
 
     merged_summary: List[str] = []
     merged_tasks: List[Dict[str, Any]] = []
     merged_open: List[str] = []
 
-    for tx in texts:
-        prompt = _build_prompt(meeting_date, tx, speakers)
-        raw = _ollama_generate(prompt, model=model, temperature=0.2, request_json=True)
-        obj = _parse_json_or_empty(raw)
-        if (_looks_truncated(obj.get("summary")) or (not obj.get("summary") and not obj.get("tasks"))):
-            # one retry with an explicit instruction
-            retry_prompt = prompt + "\n\nReturn valid JSON only. No notes."
-            raw = _ollama_generate(retry_prompt, model=model, temperature=0.2, request_json=True)
-            obj = _parse_json_or_empty(raw)
+    # Chunks are independent prompts: send them concurrently, merge in transcript order.
+    # Each chunk is submitted as soon as it is cut, so the first prompt is already
+    # in flight while the rest of the transcript is being chunked.
+    if OLLAMA_CONCURRENCY > 1:
+        with ThreadPoolExecutor(max_workers=OLLAMA_CONCURRENCY, thread_name_prefix="ollama") as ex:
+            futures = [ex.submit(_extract_chunk, meeting_date, tx, speakers, model) for tx in iter_segment_chunks(segments)]
+            objs = [f.result() for f in futures]
+    else:
+        objs = [_extract_chunk(meeting_date, tx, speakers, model) for tx in iter_segment_chunks(segments)]
 
+    for obj in objs:
         if obj.get("summary"):
             merged_summary.append(obj["summary"])
 
@@ -259,7 +470,8 @@ def extract_plan(meeting_date: date, segments: List[Dict[str, Any]], model: str
     
     # Collect names from whole transcript and fill missing owners if the evidence mentions them
     full_text = " ".join([s.get("text", "") for s in segments])
-    name_candidates = _extract_person_names(full_text)
+    known_names = [sp for sp in speakers if not _DIAR_LABEL_RE.fullmatch(sp)]
+    name_candidates = _extract_person_names(full_text, known_names)
 
     for t in merged_tasks:
         if t.get("owner"):
@@ -276,18 +488,13 @@ def extract_plan(meeting_date: date, segments: List[Dict[str, Any]], model: str
     if final_summary and final_summary[-1] not in ".!?":
         final_summary += "."
     
-    seen = set()
-    deduped_tasks: List[Dict[str, Any]] = []
-    for t in merged_tasks:
-        key = t["title"].lower()
-        if key in seen:
-            continue
-        seen.add(key)
-        deduped_tasks.append(t)
+    deduped_tasks, alias = _dedupe_tasks(merged_tasks)
     
     titles_set = {x["title"] for x in deduped_tasks}
     for x in deduped_tasks:
-        x["dependencies"] = [d for d in x.get("dependencies", []) if d in titles_set]
+        # dependencies on a collapsed duplicate point at the task that was kept
+        deps = [alias.get(d, d) for d in x.get("dependencies", [])]
+        x["dependencies"] = [d for d in dict.fromkeys(deps) if d in titles_set and d != x["title"]]
 
     # Minimal fallback so analyze never returns empty
     if not final_summary and not deduped_tasks:
@@ -309,19 +516,82 @@ def extract_plan(meeting_date: date, segments: List[Dict[str, Any]], model: str
         "open_questions": merged_open[:10]
     }
 
-def _extract_person_names(text: str) -> List[str]:
+@lru_cache(maxsize=32)
+def _name_matcher(names: Tuple[str, ...]):
+    """Automaton (or one alternation regex) over the lowercased names."""
+    if ahocorasick is not None:
+        A = ahocorasick.Automaton()
+        for n in names:
+            A.add_word(n.lower(), n)
+        A.make_automaton()
+        return A
+    alts = "|".join(re.escape(n) for n in sorted(names, key=len, reverse=True))
+    return re.compile(rf"\b(?:{alts})\b", re.IGNORECASE)
+
+def _scan_known_names(text: str, names: List[str]) -> List[str]:
+    """Known names mentioned in text, in order of first mention. One pass over the text."""
+    matcher = _name_matcher(tuple(sorted(set(names))))
+    found: List[str] = []
+    if ahocorasick is not None:
+        low = text.lower()
+        for end, n in matcher.iter(low):
+            start = end - len(n) + 1
+            # whole words only: "Al" must not match inside "Alex"
+            if (start > 0 and low[start - 1].isalnum()) or (end + 1 < len(low) and low[end + 1].isalnum()):
+                continue
+            if n not in found:
+                found.append(n)
+    else:
+        canon = {n.lower(): n for n in names}
+        for m in matcher.finditer(text):
+            n = canon[m.group(0).lower()]
+            if n not in found:
+                found.append(n)
+    return found
+
+SPACY_CACHE_SIZE = 64  # transcripts whose NER result is remembered (by digest, not text)
+_spacy_cache: "OrderedDict[bytes, List[str]]" = OrderedDict()
+_spacy_cache_lock = threading.Lock()
+
+def _spacy_person_names(text: str) -> List[str]:
+    """
+    PERSON entities via spaCy (NER pipe only). Memoized on the sha256 of the text,
+    so re-analyzing the same transcript skips NER without keeping the transcript itself.
+    """
+    key = hashlib.sha256(text.encode("utf-8")).digest()
+    with _spacy_cache_lock:
+        hit = _spacy_cache.get(key)
+        if hit is not None:
+            _spacy_cache.move_to_end(key)
+            return list(hit)
+
+    names: List[str] = []
+    doc = next(_get_nlp().pipe([text]))
+    for ent in doc.ents:
+        if ent.label_ == "PERSON":
+            n = ent.text.strip()
+            if 2 <= len(n) <= 40 and n not in names:
+                names.append(n)
+
+    with _spacy_cache_lock:
+        _spacy_cache[key] = names
+        _spacy_cache.move_to_end(key)
+        if len(_spacy_cache) > SPACY_CACHE_SIZE:
+            _spacy_cache.popitem(last=False)
+    return list(names)
+
+def _extract_person_names(text: str, known_names: Optional[List[str]] = None) -> List[str]:
     """
     Return a small unique list of person-like names.
-    Uses spaCy PERSON entities if available, else simple regex on capitalized words.
+    With known speaker names (from diarization intros), scan the text for those.
+    Otherwise use spaCy PERSON entities if USE_SPACY=1, else simple regex on capitalized words.
     """
     names: List[str] = []
-    if _NLP:
-        doc = _NLP(text)
-        for ent in doc.ents:
-            if ent.label_ == "PERSON":
-                n = ent.text.strip()
-                if 2 <= len(n) <= 40 and n not in names:
-                    names.append(n)
+    nlp = _get_nlp() if USE_SPACY and not known_names else None
+    if known_names:
+        names = _scan_known_names(text, known_names)
+    elif nlp:
+        names = _spacy_person_names(text)
     else:
         # very simple fallback
         for m in _PERSON_RE.finditer(text):
@@ -372,12 +642,44 @@ def _this_or_next_weekday(d: date, target_idx: int) -> date:
     return d + timedelta(days=days_ahead)
 
 def _strip_leading_by(s: str) -> str:
-    return re.sub(r"^\s*(by|on|at)\s+", "", s, flags=re.IGNORECASE)
+    return _LEADING_BY_RE.sub("", s)
 
 def _rel_base_dt(meeting_date: date) -> datetime:
     # dateparser requires a datetime for RELATIVE_BASE
     return datetime.combine(meeting_date, datetime.min.time())
 
+_ISO_DATE_RE = re.compile(r"\d{4}-\d{2}-\d{2}")
+_WD_RE = re.compile(r"\b(this|next)?\s*(monday|mon|tuesday|tue|tues|wednesday|wed|thursday|thu|thur|thurs|friday|fri|saturday|sat|sunday|sun)\b")
+_IN_N_RE = re.compile(r"\b(?:in|within)\s+(\d+)\s+(day|days|week|weeks)\b")
+_LEADING_BY_RE = re.compile(r"^\s*(by|on|at)\s+", re.IGNORECASE)
+_WD_MAP = {
+    "monday": 0, "mon": 0,
+    "tuesday": 1, "tue": 1, "tues": 1,
+    "wednesday": 2, "wed": 2,
+    "thursday": 3, "thu": 3, "thur": 3, "thurs": 3,
+    "friday": 4, "fri": 4,
+    "saturday": 5, "sat": 5,
+    "sunday": 6, "sun": 6,
+}
+
+@lru_cache(maxsize=1024)
+def _dateparser_date(s_raw: str, meeting_date: date) -> Optional[str]:
+    """
+    Free-form fallback through dateparser, memoized per (phrase, meeting date).
+    English only and absolute/relative parsers only, so dateparser skips its
+    language detection and the timestamp / custom-format passes.
+    """
+    import dateparser  # slow import, only needed for the rare free-form dates
+    dt = dateparser.parse(
+        s_raw,
+        languages=["en"],
+        settings={
+            "RELATIVE_BASE": _rel_base_dt(meeting_date),
+            "PARSERS": ["relative-time", "absolute-time"],
+        },
+    )
+    return dt.date().isoformat() if dt else None
+
 def _resolve_due_date(meeting_date: date, due_ref: Optional[str]) -> Tuple[Optional[str], float]:
     """
     Extend previous resolver:
@@ -408,22 +710,11 @@ def _resolve_due_date(meeting_date: date, due_ref: Optional[str]) -> Tuple[Optio
         return _end_of_week(meeting_date).isoformat(), 0.8
     if "by eom" in s or "by end of month" in s:
         return _last_day_of_month(meeting_date).isoformat(), 0.8
-    
-    wd_map = {
-        "monday": 0, "mon": 0,
-        "tuesday": 1, "tue": 1, "tues": 1,
-        "wednesday": 2, "wed": 2,
-        "thursday": 3, "thu": 3, "thur": 3, "thurs": 3,
-        "friday": 4, "fri": 4,
-        "saturday": 5, "sat": 5,
-        "sunday": 6, "sun": 6,
-    }
-    
-    import re as _re
-    m = _re.search(r"\b(this|next)?\s*(monday|mon|tuesday|tue|tues|wednesday|wed|thursday|thu|thur|thurs|friday|fri|saturday|sat|sunday|sun)\b", s)
+
+    m = _WD_RE.search(s)
     if m:
         which = (m.group(1) or "").strip()
-        target_idx = wd_map[m.group(2)]
+        target_idx = _WD_MAP[m.group(2)]
         if which == "next":
             # strictly the following week
             dt = _next_weekday(meeting_date, target_idx)
@@ -433,18 +724,25 @@ def _resolve_due_date(meeting_date: date, due_ref: Optional[str]) -> Tuple[Optio
         return dt.isoformat(), 0.88
 
     # "in N days/weeks"
-    m = _re.search(r"\b(?:in|within)\s+(\d+)\s+(day|days|week|weeks)\b", s)
+    m = _IN_N_RE.search(s)
     if m:
         n = int(m.group(1))
         unit = m.group(2)
         dt = meeting_date + (timedelta(weeks=n) if "week" in unit else timedelta(days=n))
         return dt.isoformat(), 0.88
 
+    # ISO dates need no parser
+    if _ISO_DATE_RE.fullmatch(s_raw):
+        try:
+            return date.fromisoformat(s_raw).isoformat(), 0.9
+        except ValueError:
+            pass
+
     # fallback to dateparser (datetime)
     try:
-        dt = dateparser.parse(s_raw, settings={"RELATIVE_BASE": _rel_base_dt(meeting_date)})
-        if dt:
-            return dt.date().isoformat(), 0.9
+        iso = _dateparser_date(s_raw, meeting_date)
+        if iso:
+            return iso, 0.9
     except Exception:
         pass
 
@@ -2,32 +2,106 @@ import os
 import wave
 import tempfile
 import subprocess
-from typing import List, Tuple
+from typing import Iterator, List, Tuple, Union
 
+import numpy as np
 import webrtcvad
 
-def ensure_mono16_wav(input_path: str) -> str:
-    """
-    Returns a temp mono 16 kHz WAV path for VAD.
-    Uses ffmpeg if input is not already mono/16k WAV.
-    """
-    # Try to open as WAV and check format
+def is_mono16_wav(path: str) -> bool:
+    """True if path is a 16-bit PCM, mono, 16 kHz WAV (header check only)."""
     try:
-        with wave.open(input_path, "rb") as w:
-            ok = (
+        with wave.open(path, "rb") as w:
+            return (
                 w.getnchannels() == 1 and
                 w.getsampwidth() == 2 and
                 w.getframerate() == 16000
             )
-        if ok:
-            return input_path
-    except wave.Error:
-        pass  # not a WAV, convert
+    except (wave.Error, EOFError, OSError):
+        return False  # not a WAV (or unreadable), convert
+
+
+def _iter_av_pcm(input_path: str) -> Iterator[bytes]:
+    """16-bit mono 16 kHz PCM chunks decoded in-process with PyAV (installed with faster-whisper)."""
+    import av
+
+    resampler = av.AudioResampler(format="s16", layout="mono", rate=16000)
+    with av.open(input_path, metadata_errors="ignore") as container:
+        for frame in container.decode(audio=0):
+            frame.pts = None  # let the resampler ignore gaps/jumps in input timestamps
+            for out in resampler.resample(frame):
+                yield out.to_ndarray().tobytes()
+        for out in resampler.resample(None):  # flush
+            yield out.to_ndarray().tobytes()
+
+
+def decode_to_mono16_wav(input_path: str, out_path: str):
+    """
+    Decode any audio/video file to 16-bit mono 16 kHz WAV in-process with PyAV,
+    frame by frame, so there is no ffmpeg fork per file and memory stays flat
+    on long recordings.
+    """
+    with wave.open(out_path, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(16000)
+        for chunk in _iter_av_pcm(input_path):
+            w.writeframes(chunk)
+
+
+def load_mono16_pcm(input_path: str) -> np.ndarray:
+    """
+    Decode any input straight into a 16 kHz mono int16 array, with no temp file:
+    - already 16k mono WAV: read the frames
+    - other 16 kHz files libsndfile can read (WAV/FLAC/OGG, any channel count): soundfile + downmix
+    - anything else: PyAV decode + resample in memory
+    ffmpeg via ensure_mono16_wav is only the last resort.
+    """
+    if is_mono16_wav(input_path):
+        with wave.open(input_path, "rb") as w:
+            return np.frombuffer(w.readframes(w.getnframes()), dtype=np.int16)
+
+    try:
+        import soundfile as sf
+        if sf.info(input_path).samplerate == 16000:
+            data, _ = sf.read(input_path, dtype="int16", always_2d=True)
+            if data.shape[1] == 1:
+                return np.ascontiguousarray(data[:, 0])
+            return data.mean(axis=1).astype(np.int16)
+    except Exception:
+        pass  # not a libsndfile format, or needs resampling
+
+    try:
+        return np.frombuffer(b"".join(_iter_av_pcm(input_path)), dtype=np.int16)
+    except Exception:
+        pass  # PyAV missing or could not read it
+
+    wav_path = ensure_mono16_wav(input_path)
+    try:
+        with wave.open(wav_path, "rb") as w:
+            return np.frombuffer(w.readframes(w.getnframes()), dtype=np.int16)
+    finally:
+        if wav_path != input_path and os.path.exists(wav_path):
+            os.unlink(wav_path)
+
+
+def ensure_mono16_wav(input_path: str) -> str:
+    """
+    Returns a temp mono 16 kHz WAV path for VAD.
+    Decodes with PyAV if input is not already mono/16k WAV, ffmpeg as a fallback.
+    """
+    if is_mono16_wav(input_path):
+        return input_path
 
-    # Convert with ffmpeg
     tmp = tempfile.NamedTemporaryFile(suffix=".wav", delete=False)
     tmp.close()
     out_path = tmp.name
+    try:
+        decode_to_mono16_wav(input_path, out_path)
+        return out_path
+    except Exception:
+        pass  # PyAV missing or could not read it; try the ffmpeg CLI
+
+    # Convert with ffmpeg
     cmd = [
         "ffmpeg", "-nostats", "-loglevel", "error",
         "-y", "-i", input_path,
@@ -43,9 +117,16 @@ def ensure_mono16_wav(input_path: str) -> str:
     return out_path
 
 
-def _frames_10ms(pcm: bytes, sample_rate: int) -> List[bytes]:
-    frame_bytes = int(0.01 * sample_rate) * 2  # 16-bit mono
-    return [pcm[i:i+frame_bytes] for i in range(0, len(pcm), frame_bytes)]
+def _frames_10ms(pcm: Union[bytes, np.ndarray], sample_rate: int) -> np.ndarray:
+    """(n_frames, samples_per_frame) int16 view of the PCM, built once with no copies.
+    A trailing partial frame is dropped (webrtcvad rejects short frames)."""
+    frame_len = int(0.01 * sample_rate)
+    if isinstance(pcm, np.ndarray):
+        samples = pcm
+    else:
+        samples = np.frombuffer(pcm, dtype=np.int16, count=len(pcm) // 2)
+    n = len(samples) // frame_len
+    return samples[:n * frame_len].reshape(n, frame_len)
 
 
 def detect_voice_regions(
@@ -60,39 +141,47 @@ def detect_voice_regions(
     - pad_ms: soft padding around voiced frames
     - min_region_ms: drop tiny blips
     """
-    vad = webrtcvad.Vad(aggressiveness)
     with wave.open(wav_path, "rb") as w:
         assert w.getnchannels() == 1 and w.getsampwidth() == 2
         sr = w.getframerate()
         pcm = w.readframes(w.getnframes())
+    return detect_voice_regions_pcm(pcm, sr, aggressiveness=aggressiveness, pad_ms=pad_ms, min_region_ms=min_region_ms)
+
 
+def detect_voice_regions_pcm(
+    pcm: Union[bytes, np.ndarray],  # 16-bit mono PCM bytes or int16 array
+    sr: int,
+    aggressiveness: int = 2,
+    pad_ms: int = 300,
+    min_region_ms: int = 400,
+) -> List[Tuple[float, float]]:
+    """
+    Same as detect_voice_regions, for 16-bit mono PCM already in memory.
+    """
+    vad = webrtcvad.Vad(aggressiveness)
     frames = _frames_10ms(pcm, sr)
-    voiced = [vad.is_speech(f, sr) for f in frames]
+    # one C call per frame is unavoidable; each row becomes bytes only at the call,
+    # and is_speech is looked up once instead of per frame (~360k frames per hour)
+    n = len(frames)
+    is_speech = vad.is_speech
+    voiced = np.fromiter((is_speech(row.tobytes(), sr) for row in frames), dtype=bool, count=n)
 
-    # Pad voiced frames
+    # Pad voiced frames: frame i is kept if any frame in [i - win, i + win] is voiced.
+    # Window counts come from a prefix sum, O(n) whatever the window size.
     win = max(0, int(pad_ms / 10))
-    padded = []
-    for i in range(len(voiced)):
-        lo = max(0, i - win)
-        hi = min(len(voiced), i + win + 1)
-        padded.append(any(voiced[lo:hi]))
-
-    # Merge into regions
-    regions: List[Tuple[float, float]] = []
-    start = None
-    for i, k in enumerate(padded):
-        t = i * 0.01
-        if k and start is None:
-            start = t
-        if not k and start is not None:
-            regions.append((start, t))
-            start = None
-    if start is not None:
-        regions.append((start, len(frames) * 0.01))
+    csum = np.concatenate(([0], np.cumsum(voiced, dtype=np.int64)))
+    idx = np.arange(n)
+    padded = (csum[np.minimum(idx + win + 1, n)] - csum[np.maximum(idx - win, 0)]) > 0
+
+    # Merge into regions: +1 / -1 steps of the padded mask are region starts / ends
+    edges = np.diff(np.concatenate(([0], padded.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1) * 0.01
+    ends = np.flatnonzero(edges == -1) * 0.01
 
     # Drop very short segments and merge small gaps
     min_len = min_region_ms / 1000.0
-    regions = [(s, e) for s, e in regions if e - s >= min_len]
+    keep = (ends - starts) >= min_len
+    regions = list(zip(starts[keep].tolist(), ends[keep].tolist()))
 
     merged: List[Tuple[float, float]] = []
     for s, e in regions:
@@ -0,0 +1,68 @@
+"""
+Cache for ASR output keyed on the normalized audio.
+
+The key is sha256 of the 16 kHz mono WAV plus the ASR config string, so the
+same recording uploaded again (or re-run from the UI) skips faster-whisper.
+Segments are stored before diarization; speakers are assigned per request.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import hashlib
+import os
+
+import orjson
+from sqlmodel import Session
+from store.db import CachedTranscription, engine
+
+
+ASR_CACHE = os.getenv("ASR_CACHE", "1") == "1"  # set to 0 to always run ASR
+
+
+def audio_sha256(path: str) -> Optional[str]:
+    try:
+        with open(path, "rb") as f:
+            return hashlib.file_digest(f, "sha256").hexdigest()
+    except OSError as e:
+        print(f"[asr_cache] hash failed: {e}")
+        return None
+
+
+def cache_key(path: str, config: str) -> Optional[Tuple[str, str]]:
+    """(key, audio_sha256) for a normalized WAV, or None when caching is off."""
+    if not ASR_CACHE:
+        return None
+    sha = audio_sha256(path)
+    if sha is None:
+        return None
+    return hashlib.sha256(f"{sha}\n{config}".encode("utf-8")).hexdigest(), sha
+
+
+def get(key: Optional[Tuple[str, str]]) -> Optional[Tuple[Optional[float], List[Dict[str, Any]]]]:
+    """(duration_sec, segments) on a hit; segments have speaker=None."""
+    if key is None:
+        return None
+    with Session(engine, expire_on_commit=False) as session:
+        row = session.get(CachedTranscription, key[0])
+        if not row:
+            return None
+        return row.duration_sec, orjson.loads(row.segments_json)
+
+
+def put(key: Optional[Tuple[str, str]], config: str, duration: Optional[float], segments: List[Dict[str, Any]]):
+    if key is None:
+        return
+    rows = [{"idx": s["idx"], "start": s["start"], "end": s["end"], "text": s["text"], "speaker": None} for s in segments]
+    try:
+        with Session(engine, expire_on_commit=False) as session:
+            if session.get(CachedTranscription, key[0]):
+                return
+            session.add(CachedTranscription(
+                key=key[0],
+                audio_sha256=key[1],
+                config=config,
+                duration_sec=duration,
+                segments_json=orjson.dumps(rows).decode(),
+            ))
+            session.commit()
+    except Exception as e:
+        # a cache write must never fail the request (e.g. two uploads of the same file racing)
+        print(f"[asr_cache] store failed: {e}")
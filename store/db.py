@@ -1,22 +1,57 @@
-from sqlmodel import SQLModel, Field, create_engine
-from sqlalchemy import Column, DateTime
-from typing import Optional
+from sqlmodel import SQLModel, Field, Relationship, create_engine
+from sqlalchemy import JSON, Column, DateTime, Index, LargeBinary, event
+from typing import List, Optional
 from datetime import datetime, date, timezone
+import orjson
 
 # SQLite 
 DATABASE_URL = "sqlite:///./collabplan.db"
-engine = create_engine(DATABASE_URL, echo=False)
+engine = create_engine(
+    DATABASE_URL,
+    echo=False,
+    future=True,
+    pool_size=20,
+    max_overflow=40,
+    pool_pre_ping=True,
+    pool_recycle=1800,
+    # JSON columns go through orjson instead of the stdlib json module
+    json_serializer=lambda obj: orjson.dumps(obj).decode(),
+    json_deserializer=orjson.loads,
+)
+
+@event.listens_for(engine, "connect")
+def _sqlite_pragmas(dbapi_conn, _record):
+    # WAL lets readers run while a transcript is being written; NORMAL skips the
+    # per-commit fsync of the WAL (still durable across app crashes)
+    cur = dbapi_conn.cursor()
+    cur.execute("PRAGMA journal_mode=WAL")
+    cur.execute("PRAGMA synchronous=NORMAL")
+    cur.execute("PRAGMA temp_store=MEMORY")  # sorts / temp indexes stay off disk
+    cur.execute("PRAGMA mmap_size=30000000000")  # read pages through mmap instead of read() copies
+    cur.close()
 
 class Run(SQLModel, table=True):
     id: str = Field(primary_key=True)
     meeting_date: date
     source: str  # "upload", "recording", etc.
     duration_sec: Optional[float] = None
+    # bumped on every change to the run's plan or speakers; feeds the /run ETag
+    version: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
+    # "pending" while /transcribe is still writing segments in the background, "failed" if that gave up
+    status: str = Field(default="ok", sa_column_kwargs={"server_default": "ok"})
     created_at: datetime = Field(
     sa_column=Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
 )
 
+    # read-side relationships so a run can be loaded with its children in one go
+    segments: List["Segment"] = Relationship(sa_relationship_kwargs={"order_by": "Segment.idx", "viewonly": True})
+    plan: Optional["Plan"] = Relationship(sa_relationship_kwargs={"uselist": False, "viewonly": True})
+    tasks: List["TaskRow"] = Relationship(sa_relationship_kwargs={"order_by": "TaskRow.id", "viewonly": True})
+
 class Segment(SQLModel, table=True):
+    # (run_id, idx) serves "WHERE run_id = ? ORDER BY idx" straight from the B-tree, no sort step
+    __table_args__ = (Index("ix_segment_run_idx", "run_id", "idx"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     run_id: str = Field(foreign_key="run.id")
     idx: int
@@ -27,9 +62,11 @@ class Segment(SQLModel, table=True):
 
 class Plan(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    run_id: str = Field(foreign_key="run.id", index=True)
+    # one plan per run (_replace_plan deletes before writing); unique index also serves the lookup
+    run_id: str = Field(foreign_key="run.id", index=True, unique=True)
     summary: str
-    open_questions_json: str  # JSON-encoded list
+    # JSON column, decoded to a list on load; DB column keeps its original name
+    open_questions: List[str] = Field(default_factory=list, sa_column=Column("open_questions_json", JSON, nullable=False))
 
 class TaskRow(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -38,10 +75,75 @@ class TaskRow(SQLModel, table=True):
     owner: Optional[str] = None
     due_date: Optional[date] = None
     priority: Optional[str] = None
-    dependencies_json: str = "[]"
+    dependencies: List[str] = Field(default_factory=list, sa_column=Column("dependencies_json", JSON, nullable=False))
     evidence_idx: Optional[int] = None
-    evidence_span_json: Optional[str] = None
+    # NULL when there is no span (none_as_null), not the JSON text 'null'
+    evidence_span: Optional[List[int]] = Field(default=None, sa_column=Column("evidence_span_json", JSON(none_as_null=True)))
     confidence: Optional[float] = None
 
+class PlanCache(SQLModel, table=True):
+    key: str = Field(primary_key=True)  # sha256 of model + meeting date + transcript
+    model: str
+    meeting_date: date
+    plan_json: str  # JSON-encoded extract_plan() result
+    embedding: Optional[bytes] = Field(default=None, sa_column=Column(LargeBinary))  # float32 vector
+    created_at: datetime = Field(
+    sa_column=Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+)
+
+class CachedTranscription(SQLModel, table=True):
+    key: str = Field(primary_key=True)  # sha256 of audio_sha256 + config
+    audio_sha256: str = Field(index=True)  # sha256 of the normalized 16 kHz WAV
+    config: str  # model / compute type / VAD / beam settings the segments came from
+    duration_sec: Optional[float] = None
+    segments_json: str  # JSON-encoded [{"idx", "start", "end", "text"}], before diarization
+    created_at: datetime = Field(
+    sa_column=Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+)
+
+def bulk_insert_segments(run_id: str, segs: List[dict], conn=None):
+    """
+    Insert a run's segments with one executemany in a single transaction.
+    Pass conn to join a transaction that is already open (e.g. with the Run row).
+    """
+    if not segs:
+        return
+    rows = [{"run_id": run_id, **s} for s in segs]
+    if conn is not None:
+        conn.execute(Segment.__table__.insert(), rows)
+        return
+    with engine.begin() as c:
+        c.execute(Segment.__table__.insert(), rows)
+
+# Columns added after the first release: (table, column, DDL) for ALTER TABLE on older databases
+_ADDED_COLUMNS = [
+    ("run", "version", "INTEGER NOT NULL DEFAULT 0"),
+    ("run", "status", "VARCHAR NOT NULL DEFAULT 'ok'"),
+]
+
+def _add_missing_columns():
+    # create_all never alters an existing table, so new columns are added here
+    with engine.begin() as conn:
+        for table, column, ddl in _ADDED_COLUMNS:
+            have = {row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({table})")}
+            if column not in have:
+                conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+
+def _make_plan_run_id_unique():
+    # Older databases have a non-unique ix_plan_run_id, and checkfirst only matches
+    # indexes by name, so rebuild it as UNIQUE here, keeping the newest plan per run
+    with engine.begin() as conn:
+        unique_by_name = {row[1]: row[2] for row in conn.exec_driver_sql('PRAGMA index_list("plan")')}
+        if unique_by_name.get("ix_plan_run_id") == 0:
+            conn.exec_driver_sql('DELETE FROM "plan" WHERE id NOT IN (SELECT MAX(id) FROM "plan" GROUP BY run_id)')
+            conn.exec_driver_sql("DROP INDEX ix_plan_run_id")
+            conn.exec_driver_sql('CREATE UNIQUE INDEX ix_plan_run_id ON "plan" (run_id)')
+
 def init_db():
-    SQLModel.metadata.create_all(engine)
+    SQLModel.metadata.create_all(engine, checkfirst=True)
+    _add_missing_columns()
+    _make_plan_run_id_unique()
+    # create_all skips tables that already exist, so add indexes introduced later explicitly
+    for table in SQLModel.metadata.sorted_tables:
+        for ix in table.indexes:
+            ix.create(engine, checkfirst=True)
@@ -0,0 +1,171 @@
+"""
+Cache for extract_plan() results keyed on the transcript.
+
+- Exact hits: sha256 of (model, meeting date, transcript) looked up in SQLite.
+- Near-identical transcripts: cosine similarity of sentence embeddings,
+  searched with a FAISS inner-product index. Only used when
+  sentence-transformers and faiss are installed; otherwise exact-match only.
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+from datetime import date
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+import hashlib
+import os
+import threading
+
+import orjson
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session, select
+from store.db import PlanCache, engine
+
+
+PLAN_CACHE = os.getenv("PLAN_CACHE", "1") == "1"  # set to 0 to always call the LLM
+PLAN_CACHE_SIM = float(os.getenv("PLAN_CACHE_SIM", "0.97"))  # cosine threshold for a semantic hit
+EMBED_MODEL = os.getenv("PLAN_CACHE_EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+
+_lock = threading.Lock()
+_embedder = None
+_index = None
+_index_rows: List[Tuple[str, str, date]] = []  # (key, model, meeting_date), aligned with _index
+
+
+@dataclass
+class CacheProbe:
+    key: str
+    model: str
+    meeting_date: date
+    embedding: Optional["np.ndarray"] = None
+    plan: Optional[Dict[str, Any]] = None
+
+
+def _transcript_text(segments: List[Dict[str, Any]]) -> str:
+    return "\n".join(f"{s.get('speaker') or ''}\t{s.get('text') or ''}" for s in segments)
+
+
+@lru_cache(maxsize=1)
+def _ann_deps():
+    """(numpy, faiss, SentenceTransformer), or None when the optional deps are missing.
+    Imported on first cache miss so app startup does not pay for torch."""
+    try:
+        import numpy as np
+        import faiss
+        from sentence_transformers import SentenceTransformer
+    except Exception:
+        return None
+    return np, faiss, SentenceTransformer
+
+
+def _get_embedder():
+    global _embedder
+    if _embedder is None:
+        _, _, SentenceTransformer = _ann_deps()
+        try:
+            # ONNX backend keeps the embedding cheap on CPU
+            _embedder = SentenceTransformer(EMBED_MODEL, backend="onnx")
+        except Exception:
+            _embedder = SentenceTransformer(EMBED_MODEL)
+    return _embedder
+
+
+def _embed(text: str) -> Optional["np.ndarray"]:
+    deps = _ann_deps()
+    if deps is None:
+        return None
+    np = deps[0]
+    try:
+        vec = _get_embedder().encode([text], normalize_embeddings=True)
+        return np.asarray(vec, dtype=np.float32)
+    except Exception as e:
+        print(f"[plan_cache] embed failed: {e}")
+        return None
+
+
+def _ensure_index(dim: int):
+    """Build the FAISS index from stored embeddings on first use. Caller holds _lock."""
+    global _index
+    if _index is not None:
+        return
+    np, faiss, _ = _ann_deps()
+    _index = faiss.IndexFlatIP(dim)
+    with Session(engine, expire_on_commit=False) as session:
+        rows = session.exec(select(PlanCache).where(PlanCache.embedding != None)).all()  # noqa: E711
+    vecs = []
+    for r in rows:
+        v = np.frombuffer(r.embedding, dtype=np.float32)
+        if v.size == dim:
+            vecs.append(v)
+            _index_rows.append((r.key, r.model, r.meeting_date))
+    if vecs:
+        _index.add(np.stack(vecs))
+
+
+def probe(meeting_date: date, segments: List[Dict[str, Any]], model: str) -> CacheProbe:
+    """
+    Look up a cached plan for this transcript. probe.plan is set on a hit;
+    pass the probe to store() after a miss so the embedding is not recomputed.
+    """
+    text = _transcript_text(segments)
+    key = hashlib.sha256(f"{model}\n{meeting_date.isoformat()}\n{text}".encode("utf-8")).hexdigest()
+    p = CacheProbe(key=key, model=model, meeting_date=meeting_date)
+    if not PLAN_CACHE:
+        return p
+
+    with Session(engine, expire_on_commit=False) as session:
+        row = session.get(PlanCache, key)
+        if row:
+            p.plan = orjson.loads(row.plan_json)
+            return p
+
+    p.embedding = _embed(text)
+    if p.embedding is None:
+        return p
+
+    with _lock:
+        _ensure_index(p.embedding.shape[1])
+        if _index.ntotal == 0:
+            return p
+        scores, ids = _index.search(p.embedding, min(8, _index.ntotal))
+
+    # plans depend on model and meeting date (due dates), so only accept matching neighbours
+    for score, i in zip(scores[0], ids[0]):
+        if i < 0 or score < PLAN_CACHE_SIM:
+            break
+        hit_key, hit_model, hit_date = _index_rows[i]
+        if hit_model == model and hit_date == meeting_date:
+            with Session(engine, expire_on_commit=False) as session:
+                row = session.get(PlanCache, hit_key)
+                if row:
+                    p.plan = orjson.loads(row.plan_json)
+                    return p
+    return p
+
+
+def store(p: CacheProbe, plan: Dict[str, Any]):
+    if not PLAN_CACHE:
+        return
+    # ON CONFLICT DO NOTHING: two /analyze calls on the same transcript can both miss
+    # the probe, and the second insert must not turn a finished LLM call into a 500
+    stmt = sqlite_insert(PlanCache.__table__).values(
+        key=p.key,
+        model=p.model,
+        meeting_date=p.meeting_date,
+        plan_json=orjson.dumps(plan).decode(),
+        embedding=p.embedding.tobytes() if p.embedding is not None else None,
+    ).on_conflict_do_nothing(index_elements=["key"])
+    try:
+        with engine.begin() as conn:
+            inserted = conn.execute(stmt).rowcount == 1
+    except Exception as e:
+        # a cache write must never fail the request
+        print(f"[plan_cache] store failed: {e}")
+        return
+    if not inserted:
+        return  # another request stored it (and indexed its embedding) first
+
+    if p.embedding is not None:
+        with _lock:
+            _ensure_index(p.embedding.shape[1])
+            _index.add(p.embedding)
+            _index_rows.append((p.key, p.model, p.meeting_date))
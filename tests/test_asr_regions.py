@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+asr = pytest.importorskip("core.asr")
+
+
+def _engine(monkeypatch, merged_segments):
+    # concatenation path only: no model, no batched pipeline
+    eng = object.__new__(asr.ASREngine)
+    eng.batched = None
+
+    def fake_iter_one_file(audio, beam_size=5, language=None, vad_filter=False):
+        segs = [asr.ASRSegment(idx=i, start=s, end=e, text=t) for i, (s, e, t) in enumerate(merged_segments)]
+        return len(audio) / asr.SAMPLE_RATE, iter(segs)
+
+    monkeypatch.setattr(eng, "_iter_one_file", fake_iter_one_file)
+    return eng
+
+
+def test_regions_map_back_to_file_time_and_drop_gap_segments(monkeypatch):
+    audio = np.zeros(12 * asr.SAMPLE_RATE, dtype=np.float32)
+    regions = [(0.0, 1.0), (10.0, 11.0)]
+    # merged timeline: region 0 at [0, 1], gap [1, 1 + REGION_GAP_SEC], region 1 after it
+    r1 = 1.0 + asr.REGION_GAP_SEC
+    eng = _engine(monkeypatch, [
+        (0.1, 0.9, "first"),
+        (1.05, r1, "in the gap"),  # wholly inside the inserted silence
+        (r1 + 0.1, r1 + 0.8, "second"),
+    ])
+
+    out = list(eng._iter_regions(audio, regions))
+
+    assert [s.text for s in out] == ["first", "second"]
+    assert [s.idx for s in out] == [0, 1]
+    assert out[0].start == pytest.approx(0.1) and out[0].end == pytest.approx(0.9)
+    assert out[1].start == pytest.approx(10.1) and out[1].end == pytest.approx(10.8)
+    assert all(s.end > s.start for s in out)
@@ -0,0 +1,46 @@
+from datetime import date
+
+import pytest
+
+main = pytest.importorskip("api.main")
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine
+
+
+@pytest.fixture
+def db(monkeypatch):
+    eng = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(eng)
+    monkeypatch.setattr(main, "engine", eng)
+    return eng
+
+
+def _etag(eng, run_id):
+    with Session(eng) as session:
+        return main._run_etag(session, run_id)
+
+
+def test_etag_changes_when_empty_transcript_goes_pending_to_ok(db):
+    main._insert_run("run_empty", date(2025, 1, 6), "upload", 0.0, "pending")
+    pending = _etag(db, "run_empty")
+
+    main._persist_segments("run_empty", [])  # zero segments: only the status changes
+    with Session(db) as session:
+        assert session.get(main.Run, "run_empty").status == "ok"
+    assert _etag(db, "run_empty") != pending
+
+
+def test_etag_changes_when_run_fails(db):
+    main._insert_run("run_fail", date(2025, 1, 6), "upload", 0.0, "pending")
+    pending = _etag(db, "run_fail")
+    main._set_run_status("run_fail", "failed")
+    assert _etag(db, "run_fail") != pending
+
+
+def test_etag_changes_on_reanalyze_with_reused_plan_id(db):
+    main._insert_run("run_plan", date(2025, 1, 6), "text", None)
+    plan = {"summary": "a", "tasks": [], "open_questions": []}
+    main._replace_plan("run_plan", plan)
+    first = _etag(db, "run_plan")
+    main._replace_plan("run_plan", {**plan, "summary": "b"})
+    assert _etag(db, "run_plan") != first